@@ -1,4 +1,8 @@
-from common import Spades, Card, Suit, Hearts, Clubs, Diamonds, edge_col
+import marshal
+import os
+import threading
+
+from common import Spades, Card, Suit, Hearts, Clubs, Diamonds, edge_col, deck
 
 congrats = """                                                                                                 
                                                                                                  
@@ -29,6 +33,27 @@ congrats = """
 tip = "                                Press [ n ] To Start New Game ...                                "
 
 
+class Playback:
+    def __init__(self, frames, interval=0.05, delay=0.0):
+        self.frames = frames
+        self.interval = interval
+        self.delay = delay
+        self.index = 0
+        self.deadline = None
+
+    def started(self) -> bool:
+        return self.index > 0
+
+    def done(self) -> bool:
+        return self.index >= len(self.frames)
+
+    def advance(self, now):
+        frame = self.frames[self.index]
+        self.index += 1
+        self.deadline = now + self.interval
+        return frame
+
+
 def get_frame_index(timeline, t):
     l = len(timeline)
     i = t if 0 <= t < l else 0 if t < 0 else l - 1
@@ -38,8 +63,8 @@ def get_frame_index(timeline, t):
 class StackSparkleAnimation:
     def __init__(self, suit: Suit):
         card = Card(suit, 13)
-        self.last = str(card).splitlines()
-        self.last_h = str(card.highlight()).splitlines()
+        self.last = card.lines
+        self.last_h = card.lit.lines
 
     def get_frame(self, t) -> list[str]:
         return self.last_h if t % 2 == 0 else self.last
@@ -71,7 +96,7 @@ class StacksSparkleAnimation:
 class StacksTranslateAnimation:
     def __init__(self, suits: list[Suit]):
         cards = [Card(suit, 13) for suit in suits]
-        cards = [str(card.highlight()).splitlines() for card in cards]
+        cards = [card.lit.lines for card in cards]
         m = max([len(card) for card in cards])
 
         self.lines = []
@@ -96,15 +121,15 @@ class StacksTranslateAnimation:
 class StackUnfoldAnimation:
     def __init__(self, suit: Suit):
         self.cards = [Card(suit, i + 1) for i in range(13)]
-        self.last = str(self.cards[-1]).splitlines()
-        self.last_h = str(self.cards[-1].highlight()).splitlines()
+        self.last = self.cards[-1].lines
+        self.last_h = self.cards[-1].lit.lines
         self.timeline = [t for t in range(26)] + [25 - t for t in range(26)]
 
     def get_frame(self, t) -> list[str]:
         return self.__get_frame(get_frame_index(self.timeline, t))
 
     def __get_frame(self, frame_index) -> list[str]:
-        card_strs = [str(card).splitlines() for card in self.cards[:-1]]
+        card_strs = [card.lines for card in self.cards[:-1]]
 
         i = frame_index // 2
         j = frame_index % 2
@@ -200,3 +225,61 @@ class CongratulationAnimation:
         elif delta < 0:
             lines = lines[:delta]
         return lines
+
+    def compile(self) -> tuple[tuple[str, ...], ...]:
+        unique = {}
+        frames = []
+        for t in range(len(self.timeline)):
+            frame = tuple(self.get_frame(t))
+            frames.append(unique.setdefault(frame, frame))
+        return tuple(frames)
+
+    def digest(self) -> str:
+        import hashlib
+
+        h = hashlib.sha1()
+        with open(__file__, "rb") as f:
+            h.update(f.read())
+        glyphs = [line for card in deck for line in (*card.lines, *card.lit.lines)]
+        h.update(repr((congrats, tip, self.timeline, glyphs, edge_col(""))).encode())
+        return h.hexdigest()[:16]
+
+
+compiled = None
+compile_lock = threading.Lock()
+
+
+def congrats_frames(cache_dir=None) -> tuple[tuple[str, ...], ...]:
+    global compiled
+    with compile_lock:
+        if compiled is None:
+            an = CongratulationAnimation()
+            path = os.path.join(cache_dir, f"congrats-{an.digest()}.bin") if cache_dir else None
+            compiled = load_frames(path) or an.compile()
+            if path and not os.path.exists(path):
+                save_frames(path, compiled)
+        return compiled
+
+
+def precompile(cache_dir=None):
+    if compiled is None:
+        threading.Thread(target=congrats_frames, args=(cache_dir,), daemon=True).start()
+
+
+def load_frames(path):
+    try:
+        with open(path, "rb") as f:
+            return marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def save_frames(path, frames):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            marshal.dump(frames, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
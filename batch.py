@@ -0,0 +1,116 @@
+import numpy as np
+
+from deals import ms_suits
+
+# actions are src * 16 + dst over the game's stack indices: columns 0-7, foundations 8-11 in
+# suit order, free cells 12-15; cards are the ints of state.py, -1 is no card
+STACKS = 16
+ACTIONS = STACKS * STACKS
+DEPTH = 20  # 7 dealt cards under a king and its run of 12, with room to spare
+
+src_of = np.arange(ACTIONS) // STACKS
+dst_of = np.arange(ACTIONS) % STACKS
+
+
+def deal(numbers) -> np.ndarray:
+    # the Microsoft shuffle for all deals at once, as the (n, 52) cards in dealing order
+    seed = np.asarray(numbers, dtype=np.int64)
+    cards = np.tile(np.arange(51, -1, -1, dtype=np.int64), (len(seed), 1))
+    rows = np.arange(len(seed))
+    for i in range(52):
+        seed = (seed * 214013 + 2531011) & 0x7fffffff
+        j = 51 - (seed >> 16) % (52 - i)
+        picked = cards[rows, j]
+        cards[rows, j] = cards[:, i]
+        cards[:, i] = picked
+    return (cards // 4 * 4 + np.asarray(ms_suits)[cards % 4]).astype(np.int8)
+
+
+class Batch:
+    def __init__(self, numbers):
+        n = len(numbers)
+        self.numbers = np.asarray(numbers)
+        self.cols = np.full((n, 8, DEPTH), -1, dtype=np.int8)
+        self.heights = np.zeros((n, 8), dtype=np.int8)
+        self.found = np.zeros((n, 4), dtype=np.int8)
+        self.cells = np.full((n, 4), -1, dtype=np.int8)
+        cards = deal(numbers)
+        for i in range(52):
+            self.cols[:, i % 8, i // 8] = cards[:, i]
+        self.heights[:] = [7, 7, 7, 7, 6, 6, 6, 6]
+        self.rows = np.arange(n)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def tops(self) -> np.ndarray:
+        # (n, 16) top card of every stack
+        n = len(self)
+        tops = np.full((n, STACKS), -1, dtype=np.int8)
+        depth = np.maximum(self.heights.astype(np.intp) - 1, 0)
+        column = np.take_along_axis(self.cols, depth[:, :, None], axis=2)[:, :, 0]
+        tops[:, :8] = np.where(self.heights > 0, column, -1)
+        tops[:, 8:12] = np.where(self.found > 0, (self.found - 1) * 4 + np.arange(4, dtype=np.int8), -1)
+        tops[:, 12:] = self.cells
+        return tops
+
+    def masks(self) -> np.ndarray:
+        # (n, 256) legal single-card moves, by the push rules of the three stack kinds; moves the
+        # solver never makes are left out too: from a foundation, cell to cell and a lone card
+        # to an empty column
+        tops = self.tops().astype(np.int16)
+        card = tops[:, src_of]
+        top = tops[:, dst_of]
+        has = card >= 0
+        empty = top < 0
+
+        to_column = np.where(empty, True, (top >> 2 == (card >> 2) + 1) & ((top ^ card) & 1 == 1))
+        to_foundation = ((card & 3) == dst_of - 8) & (self.found[:, (dst_of - 8) % 4] == card >> 2)
+        accepts = np.where(dst_of < 8, to_column, np.where(dst_of < 12, to_foundation, empty))
+
+        lone = np.zeros_like(has)
+        lone[:, src_of < 8] = self.heights[:, src_of[src_of < 8]] == 1
+        useless = (lone & empty & (dst_of < 8)) | ((src_of >= 12) & (dst_of >= 12))
+        return has & accepts & (src_of != dst_of) & ((src_of < 8) | (src_of >= 12)) & ~useless
+
+    def apply(self, actions, masks=None) -> np.ndarray:
+        # moves one card in every game whose action is legal, -1 skips a game; returns which moved
+        actions = np.asarray(actions)
+        masks = self.masks() if masks is None else masks
+        legal = actions >= 0
+        legal[legal] = masks[self.rows[legal], actions[legal]]
+        rows = self.rows[legal]
+        src = src_of[actions[legal]]
+        dst = dst_of[actions[legal]]
+        card = self.tops()[rows, src]
+
+        c = src < 8
+        self.heights[rows[c], src[c]] -= 1
+        self.cols[rows[c], src[c], self.heights[rows[c], src[c]]] = -1
+        f = (src >= 8) & (src < 12)
+        self.found[rows[f], src[f] - 8] -= 1
+        b = src >= 12
+        self.cells[rows[b], src[b] - 12] = -1
+
+        c = dst < 8
+        self.cols[rows[c], dst[c], self.heights[rows[c], dst[c]]] = card[c]
+        self.heights[rows[c], dst[c]] += 1
+        f = (dst >= 8) & (dst < 12)
+        self.found[rows[f], dst[f] - 8] += 1
+        b = dst >= 12
+        self.cells[rows[b], dst[b] - 12] = card[b]
+        return legal
+
+    def won(self) -> np.ndarray:
+        return self.found.sum(axis=1) == 52
+
+    def stuck(self, masks=None) -> np.ndarray:
+        masks = self.masks() if masks is None else masks
+        return ~masks.any(axis=1) & ~self.won()
+
+    def random_actions(self, rng, masks=None) -> np.ndarray:
+        # a uniformly random legal action per game, -1 where there is none
+        masks = self.masks() if masks is None else masks
+        scores = np.where(masks, rng.random(masks.shape), -1.0)
+        actions = scores.argmax(axis=1)
+        return np.where(masks.any(axis=1), actions, -1)
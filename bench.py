@@ -0,0 +1,321 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+import numpy as np
+
+from animation import CongratulationAnimation
+from batch import Batch
+from common import cache_dir
+from deals import Index, Results
+from game import Game, Commands
+from journal import Journal
+from scheduler import Loop
+from screen import Screen
+from solver import Solver
+from state import State
+
+arrows = [Commands.ARROW_UP, Commands.ARROW_DOWN, Commands.ARROW_LEFT, Commands.ARROW_RIGHT]
+
+
+class Sink:
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class Ticks:
+    # the solver's clock, a millisecond on at every read: a hint searches the same nodes on any
+    # machine and under tracemalloc
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1e-3
+        return self.now
+
+
+def fixed_game(screen, number, journal=None) -> Game:
+    # the same deal everywhere, and nothing from this machine's solved deals or difficulty index
+    empty = os.path.join(cache_dir(), "none")
+    return Game(screen, Solver(clock=Ticks()), number=number, journal=journal, results=Results(empty),
+                index=Index(empty))
+
+
+class Session:
+    def __init__(self, number, journal=None):
+        random.seed(number)
+        self.clock = Clock()
+        self.sink = Sink()
+        self.commands = 0
+        self.elapsed = 0.0
+        self.handling = 0.0
+        self.game = fixed_game(Screen(out=self.sink), number, journal)
+        self.loop = Loop(self.game, clock=self.clock, sleep=self.clock.sleep)
+
+    def step(self, items) -> float:
+        start = time.perf_counter()
+        self.loop.step(items, self.clock())
+        elapsed = time.perf_counter() - start
+        self.elapsed += elapsed
+        self.clock.sleep(self.loop.interval)
+        return elapsed
+
+    def send(self, command):
+        self.commands += 1
+        self.handling += self.step([(command, self.clock())])
+
+    def play(self):
+        while self.game.animation:
+            self.clock.sleep(self.loop.timeout())
+            self.step([])
+
+
+def near_win(game: Game):
+    # the four kings alone on the table, everything else on the foundations
+    game.import_state(State([[12 * 4 + j] for j in range(4)], (12, 12, 12, 12)))
+
+
+def script_deal(s: Session):
+    s.play()
+
+
+def script_arrows(s: Session):
+    s.play()
+    rng = random.Random(1)
+    for _ in range(500):
+        s.send(rng.choice(arrows))
+
+
+def script_tabs(s: Session):
+    s.play()
+    rng = random.Random(2)
+    for _ in range(100):
+        s.send(Commands.TAB)
+        s.send(rng.choice(arrows))
+        s.send(Commands.TAB)
+        s.send(Commands.ESC)
+
+
+def script_autoplay(s: Session):
+    s.play()
+    rng = random.Random(3)
+    for _ in range(100):
+        s.send(rng.choice(arrows))
+        s.send(Commands.TAB)
+        s.send(rng.choice(arrows))
+        s.send(Commands.TAB)
+        s.send(Commands.SPACE)
+
+
+def script_undo(s: Session):
+    script_autoplay(s)
+    # the autoplay script may end holding a card, and undo does nothing while one is held
+    s.send(Commands.ESC)
+    for _ in range(len(s.game.history) + 1):
+        s.send(Commands.UNDO)
+    if len(s.game.history):
+        raise RuntimeError(f"undo stopped with {len(s.game.history)} steps left")
+
+
+def script_win(s: Session):
+    s.play()
+    near_win(s.game)
+    s.send(Commands.SPACE)
+    s.play()
+
+
+def script_hints(s: Session):
+    # following the hints has to win; hints that undo each other would go on forever
+    s.play()
+    for _ in range(300):
+        if s.game.state == 2:
+            break
+        s.send(Commands.HINT)
+        s.send(Commands.TAB)
+    else:
+        raise RuntimeError(f"following the hints did not win deal {s.game.number} in 300 moves")
+    s.play()
+
+
+scripts = {
+    "deal": script_deal,
+    "arrows": script_arrows,
+    "tabs": script_tabs,
+    "autoplay": script_autoplay,
+    "undo": script_undo,
+    "win": script_win,
+    "hints": script_hints,
+}
+
+
+def run_session(script, number):
+    s = Session(number)
+    script(s)
+    frames = s.game.screen.frames
+
+    # a second, traced pass gives the transient allocation peak per frame
+    tracemalloc.start()
+    t = Session(number)
+    peaks = []
+    draw = t.game.screen.update
+
+    def traced(rows):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        draw(rows)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+
+    t.game.screen.update = traced
+    script(t)
+    tracemalloc.stop()
+
+    return {
+        "commands": s.commands,
+        "frames": frames,
+        "seconds": s.elapsed,
+        "fps": frames / s.elapsed if s.elapsed else 0.0,
+        "us_per_command": s.handling / s.commands * 1e6 if s.commands else 0.0,
+        "bytes_per_frame": s.sink.bytes / frames if frames else 0.0,
+        "alloc_kb_per_frame": sum(peaks) / len(peaks) / 1024 if peaks else 0.0,
+    }
+
+
+def run_resume(number, rounds=(1, 4, 16)):
+    # replay time against journal length, the journal written by rounds of the autoplay script
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for k in rounds:
+            path = os.path.join(tmp, f"journal-{k}.bin")
+            s = Session(number, Journal(path))
+            for _ in range(k):
+                script_autoplay(s)
+                s.send(Commands.UNDO)
+            s.game.journal.close()
+
+            game = fixed_game(Screen(out=Sink()), number)
+            game.skip()
+            start = time.perf_counter()
+            game.resume(*Journal(path).load())
+            elapsed = time.perf_counter() - start
+            results[k] = {
+                "records": (os.path.getsize(path) - 8) // 2,
+                "ms": elapsed * 1e3,
+                "same": game.export_state() == s.game.export_state(),
+            }
+    return results
+
+
+def run_batch(seed, games=10000, steps=50):
+    # random legal play on the batched simulator, one step being one move in every game
+    batch = Batch(range(1, games + 1))
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    for _ in range(steps):
+        masks = batch.masks()
+        batch.apply(batch.random_actions(rng, masks), masks)
+    elapsed = time.perf_counter() - start
+    return {
+        "games": games,
+        "steps": steps,
+        "game_steps_per_s": games * steps / elapsed,
+        "stuck": int(batch.stuck().sum()),
+    }
+
+
+def micro(deal, number):
+    s = Session(deal)
+    s.play()
+    game = s.game
+    game.on(Commands.ARROW_RIGHT)
+    stacks = game.table.stacks + game.header.A + game.header.B
+
+    def invalidate():
+        for stack in stacks:
+            stack.version += 1
+
+    an = CongratulationAnimation()
+    lines = str(game).splitlines()
+    cases = {
+        "game_str": lambda: str(game),
+        "game_str_cold": lambda: (invalidate(), str(game)),
+        "table_str_cold": lambda: (invalidate(), str(game.table)),
+        "header_str_cold": lambda: (invalidate(), str(game.header)),
+        "screen_draw_same": lambda: game.screen.draw(lines),
+        "screen_draw_full": lambda: (game.screen.repaint(), game.screen.draw(lines)),
+        "congrats_get_frame": lambda: an.get_frame(40),
+    }
+    return {name: timeit.timeit(case, number=number) / number * 1e6 for name, case in cases.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="headless render benchmarks")
+    parser.add_argument("--deal", type=int, default=1, help="the deal every session plays")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the batched random play")
+    parser.add_argument("--number", type=int, default=2000, help="iterations per micro benchmark")
+    parser.add_argument("--json", metavar="PATH", help="write results to PATH ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    results = {
+        "python": platform.python_version(),
+        "time": time.time(),
+        "deal": args.deal,
+        "seed": args.seed,
+    }
+    # a cache of its own, so the congratulation frames are built here and nothing else is read
+    with tempfile.TemporaryDirectory() as cache:
+        os.environ["FREECELL_CACHE"] = cache
+        results["sessions"] = {name: run_session(script, args.deal) for name, script in scripts.items()}
+        results["resume"] = run_resume(args.deal)
+        results["batch"] = run_batch(args.seed)
+        results["micro_us"] = micro(args.deal, args.number)
+
+    if args.json == "-":
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    print(f"{'session':<10}{'cmds':>7}{'frames':>8}{'fps':>10}{'us/cmd':>10}{'B/frame':>10}{'KB alloc':>10}")
+    for name, r in results["sessions"].items():
+        print(f"{name:<10}{r['commands']:>7}{r['frames']:>8}{r['fps']:>10.0f}{r['us_per_command']:>10.1f}"
+              f"{r['bytes_per_frame']:>10.0f}{r['alloc_kb_per_frame']:>10.1f}")
+    print()
+    for k, r in results["resume"].items():
+        print(f"resume x{k:<4}{r['records']:>7} records{r['ms']:>10.2f} ms{'' if r['same'] else '  MISMATCH':>10}")
+    print()
+    r = results["batch"]
+    print(f"batch     {r['games']} games x {r['steps']} steps, {r['game_steps_per_s']:.0f} game-steps/s")
+    print()
+    for name, us in results["micro_us"].items():
+        print(f"{name:<20}{us:>10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
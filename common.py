@@ -1,4 +1,12 @@
-from colorama import Fore
+import os
+
+
+# colorama's Fore codes, spelled out so that importing the cards does not pull in colorama
+class Fore:
+    BLUE = "\033[34m"
+    RED = "\033[31m"
+    GREEN = "\033[32m"
+    RESET = "\033[39m"
 
 
 class Suit:
@@ -18,12 +26,28 @@ Diamonds = Suit('♦', Fore.RED, 1)  # 方块 - 红色
 
 
 class Card:
-    def __init__(self, suit: Suit, rank, h=0):
-        self.suit = suit
-        self.rank = rank
-        self.h = h
+    __slots__ = ("suit", "rank", "h", "lines", "fold", "lit")
+    interned = {}
 
-    def __str__(self):
+    def __new__(cls, suit: Suit, rank, h=0):
+        return cls.intern(suit, rank, h)
+
+    @classmethod
+    def intern(cls, suit, rank, h):
+        key = (cls, suit, rank, h)
+        card = Card.interned.get(key)
+        if card is None:
+            card = object.__new__(cls)
+            card.suit = suit
+            card.rank = rank
+            card.h = h
+            card.lines = card.render()
+            card.fold = card.lines[:2]
+            card.lit = card if h else cls.intern(suit, rank, 1)
+            Card.interned[key] = card
+        return card
+
+    def render(self) -> tuple[str, ...]:
         rank = self.rank
         if rank == 1:
             rank = 'A'
@@ -53,13 +77,27 @@ class Card:
 
         if self.h == 1:
             lines = [f"\033[7m{line}\033[0m" for line in lines]
-        return "\n".join(lines)
+        elif self.h == 2:
+            # an empty slot marking where the grabbed card can go
+            lines = [f"{Fore.GREEN}{line}{Fore.RESET}" for line in lines]
+        return tuple(lines)
+
+    def __str__(self):
+        return "\n".join(self.lines)
 
     def __repr__(self):
         return self.__str__()
 
     def highlight(self):
-        return Card(self.suit, self.rank, 1)
+        return self.lit
+
+
+deck = [Card(suit, rank) for rank in range(1, 14) for suit in (Spades, Hearts, Clubs, Diamonds)]
+
 
 def edge_col(text):
-    return f"\033[38;5;240m{text}\033[0m"
\ No newline at end of file
+    return f"\033[38;5;240m{text}\033[0m"
+
+
+def cache_dir():
+    return os.environ.get("FREECELL_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "freecell")
@@ -0,0 +1,305 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+from common import cache_dir
+from solver import Solver
+from state import State
+
+UNKNOWN = 0
+SOLVABLE = 1
+UNSOLVABLE = 2
+GAVE_UP = 3
+
+# Microsoft numbers cards rank-major with suits in C, D, H, S order
+ms_suits = [2, 3, 1, 0]
+classic = 32000
+
+
+def deal(n) -> list[list[int]]:
+    seed = n
+    cards = list(range(51, -1, -1))
+    for i in range(52):
+        seed = (seed * 214013 + 2531011) & 0x7fffffff
+        j = 51 - (seed >> 16) % (52 - i)
+        cards[i], cards[j] = cards[j], cards[i]
+
+    cols = [[] for _ in range(8)]
+    for i, card in enumerate(cards):
+        cols[i % 8].append(card // 4 * 4 + ms_suits[card % 4])
+    return cols
+
+
+class Results:
+    # one fixed record per deal number: status, solution length, nodes expanded; next to it the
+    # solvable numbers as a flat uint32 file, mapped like the index so a pick reads 4 bytes
+    record = struct.Struct("<BxHI")
+    number = struct.Struct("<I")
+
+    def __init__(self, path, write=False):
+        self.path = path
+        self.file = None
+        self.numbers = None
+        if write:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.file = open(path, "r+b" if os.path.exists(path) else "w+b")
+        elif os.path.exists(path):
+            self.file = open(path, "rb")
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+        if self.numbers:
+            self.numbers.close()
+        self.numbers = None
+
+    def size(self) -> int:
+        if not self.file:
+            return 0
+        return max(os.fstat(self.file.fileno()).st_size // self.record.size - 1, 0)
+
+    def solvable(self) -> int:
+        if self.numbers is None:
+            self.numbers = b""
+            try:
+                with open(solvable_path(self.path), "rb") as f:
+                    self.numbers = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                pass
+        return len(self.numbers) // self.number.size
+
+    def solvable_at(self, i) -> int:
+        return self.number.unpack_from(self.numbers, i * self.number.size)[0]
+
+    def save_solvable(self):
+        # rewritten after every solve or index run; the status is the first byte of a record
+        self.file.flush()
+        self.file.seek(0)
+        statuses = self.file.read()[::self.record.size]
+        data = b"".join([self.number.pack(n) for n, status in enumerate(statuses) if n and status == SOLVABLE])
+        path = solvable_path(self.path)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get(self, n) -> tuple[int, int, int]:
+        if not self.file:
+            return UNKNOWN, 0, 0
+        self.file.seek(n * self.record.size)
+        data = self.file.read(self.record.size)
+        if len(data) < self.record.size:
+            return UNKNOWN, 0, 0
+        return self.record.unpack(data)
+
+    def put(self, n, status, length, nodes):
+        self.file.seek(n * self.record.size)
+        self.file.write(self.record.pack(status, min(length, 0xffff), min(nodes, 0xffffffff)))
+
+
+class Index:
+    # header: magic, version, then (offset, count) per level; records are grouped by level
+    header = struct.Struct("<4sHH6I")
+    record = struct.Struct("<IIHBB")
+    levels = ("easy", "medium", "hard")
+
+    def __init__(self, path):
+        self.mm = None
+        self.spans = [(0, 0)] * len(self.levels)
+        try:
+            with open(path, "rb") as f:
+                self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return
+        if len(self.mm) < self.header.size:
+            self.close()
+            return
+        magic, version, _, *spans = self.header.unpack_from(self.mm)
+        spans = list(zip(spans[::2], spans[1::2]))
+        # a damaged file is ignored as a whole, pick() then trusts every span
+        inside = all([self.header.size <= offset and offset + count * self.record.size <= len(self.mm)
+                      for offset, count in spans])
+        if magic != b"FCDX" or version != 1 or not inside:
+            self.close()
+            return
+        self.spans = spans
+
+    def close(self):
+        if self.mm:
+            self.mm.close()
+            self.mm = None
+
+    def count(self, level) -> int:
+        return self.spans[self.levels.index(level)][1]
+
+    def pick(self, rng, level) -> int | None:
+        offset, count = self.spans[self.levels.index(level)]
+        if not self.mm or not count:
+            return None
+        return self.record.unpack_from(self.mm, offset + rng.randrange(count) * self.record.size)[0]
+
+    @classmethod
+    def write(cls, path, entries):
+        # entries: (deal, nodes, length, cells needed); harder means more cells, then more search
+        entries = sorted(entries, key=lambda e: (e[3], e[1], e[2]))
+        n = len(entries)
+        bounds = [0, n // 3, n * 2 // 3, n]
+        spans = []
+        for i in range(len(cls.levels)):
+            spans += [cls.header.size + bounds[i] * cls.record.size, bounds[i + 1] - bounds[i]]
+
+        data = bytearray(cls.header.pack(b"FCDX", 1, len(cls.levels), *spans))
+        for i, (deal_, nodes, length, cells) in enumerate(entries):
+            level = next(j for j in range(len(cls.levels)) if i < bounds[j + 1])
+            data += cls.record.pack(deal_, min(nodes, 0xffffffff), min(length, 0xffff), cells, level)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+
+def results_path():
+    return os.path.join(cache_dir(), "deals.bin")
+
+
+def solvable_path(results):
+    return f"{os.path.splitext(results)[0]}-solvable.bin"
+
+
+def index_path():
+    return os.path.join(cache_dir(), "difficulty.idx")
+
+
+def pick(rng, results: Results | None = None) -> int:
+    # a known-solvable deal when any were recorded, otherwise any classic deal
+    count = results.solvable() if results else 0
+    if count:
+        return results.solvable_at(rng.randrange(count))
+    return rng.randint(1, classic)
+
+
+def classify(args) -> tuple[int, int, int, int]:
+    n, nodes, cells = args
+    solver = Solver(budget=None, cells=cells)
+    moves = solver.solve(State(deal(n)), nodes=nodes)
+    if moves is not None:
+        return n, SOLVABLE, len(moves), solver.nodes
+    return n, UNSOLVABLE if solver.exhausted() else GAVE_UP, 0, solver.nodes
+
+
+def score(args) -> tuple[int, int, int, int, int]:
+    n, nodes, record = args
+    status, length, expanded = record
+    if status == UNKNOWN:
+        _, status, length, expanded = classify((n, nodes, 4))
+    if status != SOLVABLE:
+        return n, status, length, expanded, 0
+    cells = 4
+    for k in range(4):
+        if classify((n, nodes, k))[1] == SOLVABLE:
+            cells = k
+            break
+    return n, status, length, expanded, cells
+
+
+def build_index(first, last, results: Results, path, jobs=None, nodes=20000, report=None):
+    from multiprocessing import Pool
+
+    entries = []
+    tasks = ((n, nodes, results.get(n)) for n in range(first, last + 1))
+    with Pool(jobs) as pool:
+        for i, (n, status, length, expanded, cells) in enumerate(pool.imap_unordered(score, tasks, chunksize=16)):
+            if results.file and results.get(n)[0] == UNKNOWN:
+                results.put(n, status, length, expanded)
+            if status == SOLVABLE:
+                entries.append((n, expanded, length, cells))
+            if report and (i + 1) % 256 == 0:
+                report(i + 1, last - first + 1)
+    if results.file:
+        results.save_solvable()
+    Index.write(path, entries)
+    return len(entries)
+
+
+def solve_range(first, last, results: Results, jobs=None, nodes=200000, cells=4, retry=False, report=None):
+    from multiprocessing import Pool
+
+    wanted = (UNKNOWN, GAVE_UP) if retry else (UNKNOWN,)
+    todo = array("I", [n for n in range(first, last + 1) if results.get(n)[0] in wanted])
+    done = 0
+    with Pool(jobs) as pool:
+        tasks = ((n, nodes, cells) for n in todo)
+        for n, status, length, expanded in pool.imap_unordered(classify, tasks, chunksize=16):
+            results.put(n, status, length, expanded)
+            done += 1
+            if done % 256 == 0:
+                results.file.flush()
+                if report:
+                    report(done, len(todo))
+    results.save_solvable()
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="numbered deal tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    solve = sub.add_parser("solve", help="classify a range of deals and record the results")
+    solve.add_argument("first", type=int)
+    solve.add_argument("last", type=int)
+    solve.add_argument("--jobs", type=int, default=None)
+    solve.add_argument("--nodes", type=int, default=200000, help="give up after this many expanded nodes")
+    solve.add_argument("--retry", action="store_true", help="try deals that gave up earlier again")
+
+    index = sub.add_parser("index", help="score a range of deals into the difficulty index")
+    index.add_argument("first", type=int)
+    index.add_argument("last", type=int)
+    index.add_argument("--jobs", type=int, default=None)
+    index.add_argument("--nodes", type=int, default=20000, help="node limit per solve attempt")
+    index.add_argument("--output", default=None, help="index file (default: cache dir/difficulty.idx)")
+
+    show = sub.add_parser("show", help="print recorded results")
+    show.add_argument("first", type=int)
+    show.add_argument("last", type=int)
+
+    parser.add_argument("--cache", default=None, help="results file (default: cache dir/deals.bin)")
+    args = parser.parse_args(argv)
+    path = args.cache or results_path()
+    start = time.perf_counter()
+
+    def report(done, total):
+        rate = done / (time.perf_counter() - start)
+        print(f"\r{done}/{total} deals, {rate:.1f}/s", end="", file=sys.stderr, flush=True)
+
+    if args.command == "solve":
+        results = Results(path, write=True)
+        done = solve_range(args.first, args.last, results, args.jobs, args.nodes, retry=args.retry, report=report)
+        print(f"\r{done} deals classified in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        results.close()
+    elif args.command == "index":
+        results = Results(path, write=True)
+        output = args.output or index_path()
+        done = build_index(args.first, args.last, results, output, args.jobs, args.nodes, report)
+        results.close()
+        index = Index(output)
+        counts = ", ".join(f"{level} {index.count(level)}" for level in Index.levels)
+        print(f"\r{done} solvable deals indexed in {time.perf_counter() - start:.1f}s ({counts})", file=sys.stderr)
+        index.close()
+    else:
+        results = Results(path)
+        names = {UNKNOWN: "unknown", SOLVABLE: "solvable", UNSOLVABLE: "unsolvable", GAVE_UP: "gave up"}
+        for n in range(args.first, args.last + 1):
+            status, length, nodes = results.get(n)
+            print(f"{n}\t{names[status]}\t{length}\t{nodes}")
+        results.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,23 @@
 import os
 import random
-import shutil
-import time
 from abc import abstractmethod, ABC
 
-from colorama import init
+from animation import Playback, congrats_frames, precompile
+from common import Card, Suit, Spades, Hearts, Clubs, Diamonds, edge_col, deck, cache_dir
+from deals import Index, Results, deal, pick, index_path, results_path
+import instrument
+from history import History
+from journal import Journal, steps
+from playout import Estimator
+from screen import Screen
+from solver import Solver
+from state import State, CELL, safe
 
-from animation import CongratulationAnimation
-from common import Card, Suit, Spades, Hearts, Clubs, Diamonds, edge_col
+if os.name == "nt":
+    # only the Windows console needs colorama to understand the escape codes
+    from colorama import just_fix_windows_console
 
-init()
+    just_fix_windows_console()
 
 author = "zhengyun"
 banner = f"""                                                                                                 
@@ -23,8 +31,11 @@ banner = f"""
                                                                                                  
             [ ↑ ↓ ← → ]: Move Cursor     [ n ]: New Game        [ u ]: Undo                      
             [ Tab ]: Grab / Place Card   [ Esc ]: Cancel Grab   [ Space ]: Auto Sort             
-                                                                                                 
-                                                                                                 """
+            [ h ]: Hint                  [ r ]: Redo            [ b ]: Back To Deal              
+            [ o ]: Win Odds              [ s ]: Split Run                                        """
+
+suits = [Spades, Hearts, Clubs, Diamonds]
+card_ids = {card: i for i, card in enumerate(deck)}
 
 conform_tip = """                               Do You Conform To Start A New Game?                               
                                                                                                  
@@ -33,35 +44,58 @@ conform_tip = """                               Do You Conform To Start A New Ga
 
 
 class EmptyCard(Card):
-    def __init__(self, h=0):
-        super().__init__(None, -1, h)
+    __slots__ = ()
 
-    def highlight(self):
-        return EmptyCard(1)
+    def __new__(cls, h=0):
+        return cls.intern(None, -1, h)
 
 
 def print_cards(cards):
     r = []
     cards = cards or [EmptyCard()]
-    for i, card in enumerate(cards):
-        if i == len(cards) - 1:
-            r.append(str(card))
-        else:
-            lines = str(card).splitlines()
-            for line in lines[:2]:
-                r.append(line)
-
+    for card in cards[:-1]:
+        r.extend(card.fold)
+    r.extend(cards[-1].lines)
     return r
 
 
+class Flag:
+    def __set_name__(self, owner, name):
+        self.name = "_" + name
+
+    def __get__(self, stack, owner=None):
+        return self if stack is None else getattr(stack, self.name)
+
+    def __set__(self, stack, value):
+        if getattr(stack, self.name) != value:
+            setattr(stack, self.name, value)
+            stack.version += 1
+
+
 class Stack(ABC):
+    focus = Flag()
+    trigger = Flag()
+    mode = Flag()
+
     def __init__(self, cards: list[Card]):
         self.cards = cards
-        self.focus = False
-        self.trigger = False
-        self.mode = False
+        self.version = 0
+        self._focus = False
+        self._trigger = False
+        self._mode = False
+        self.rendered = -1, ()
 
     def __str__(self):
+        return "\n".join(self.column())
+
+    def column(self) -> tuple[str, ...]:
+        version, lines = self.rendered
+        if version != self.version:
+            lines = tuple(self.render())
+            self.rendered = self.version, lines
+        return lines
+
+    def render(self) -> list[str]:
         cards = self.cards.copy()
         r = []
 
@@ -80,17 +114,24 @@ class Stack(ABC):
                     cards[-1] = cards[-1].highlight()
                 else:
                     cards = [EmptyCard().highlight()]
+        elif self.mode and not self.trigger:
+            cards += [EmptyCard(2)]
 
         r.extend(print_cards(cards or [EmptyCard()]))
         if on_card:
-            r.append(str(on_card))
-        return "\n".join(r)
+            r.extend(on_card.lines)
+        return r
 
     def __repr__(self):
         return self.__str__()
 
     def append(self, card: Card):
         self.cards.append(card)
+        self.version += 1
+
+    def remove(self) -> Card:
+        self.version += 1
+        return self.cards.pop()
 
     @abstractmethod
     def peek(self) -> Card:
@@ -101,30 +142,48 @@ class Stack(ABC):
         pass
 
     @abstractmethod
-    def push(self, card: Card) -> bool:
+    def accepts(self, card: Card) -> bool:
         pass
 
+    def push(self, card: Card) -> bool:
+        if not self.accepts(card):
+            return False
+        self.append(card)
+        return True
+
 
 class TableStack(Stack):
     def __init__(self):
         super().__init__([])
+        # runs[i]: length of the alternating descending run ending at cards[i]
+        self.runs = []
 
     def peek(self) -> Card:
         return self.cards[-1] if self.cards else None
 
     def pop(self) -> Card:
-        return self.cards.pop() if self.cards else None
+        return self.remove() if self.cards else None
 
-    def push(self, card: Card) -> bool:
+    def accepts(self, card: Card) -> bool:
         if self.cards:
             last = self.cards[-1]
             if last.rank != card.rank + 1:
                 return False
             if last.suit.cls == card.suit.cls:
                 return False
-        self.append(card)
         return True
 
+    def append(self, card: Card):
+        self.runs.append(self.runs[-1] + 1 if self.cards and self.accepts(card) else 1)
+        super().append(card)
+
+    def remove(self) -> Card:
+        self.runs.pop()
+        return super().remove()
+
+    def run(self) -> int:
+        return self.runs[-1] if self.runs else 0
+
 
 class AStack(Stack):
     def __init__(self, suit: Suit):
@@ -135,18 +194,17 @@ class AStack(Stack):
         return self.cards[-1] if len(self.cards) > 1 else None
 
     def pop(self) -> Card:
-        return self.cards.pop() if len(self.cards) > 1 else None
+        return self.remove() if len(self.cards) > 1 else None
 
-    def push(self, card: Card) -> bool:
+    def accepts(self, card: Card) -> bool:
         last = self.cards[-1]
         if last.rank != card.rank - 1:
             return False
         if last.suit != card.suit:
             return False
-        self.cards.append(card)
         return True
 
-    def __str__(self):
+    def render(self) -> list[str]:
         cards = [self.cards[-1]]
         r = []
 
@@ -165,11 +223,13 @@ class AStack(Stack):
                     cards[-1] = cards[-1].highlight()
                 else:
                     cards = [EmptyCard().highlight()]
+        elif self.mode and not self.trigger:
+            cards += [EmptyCard(2)]
 
         r.extend(print_cards(cards or [self.dummy]))
         if on_card:
-            r.append(str(on_card))
-        return "\n".join(r)
+            r.extend(on_card.lines)
+        return r
 
 
 class BStack(Stack):
@@ -180,38 +240,41 @@ class BStack(Stack):
         return self.cards[-1] if self.cards else None
 
     def pop(self) -> Card:
-        return self.cards.pop() if self.cards else None
+        return self.remove() if self.cards else None
 
-    def push(self, card: Card) -> bool:
-        if self.cards:
-            return False
-        self.cards.append(card)
-        return True
+    def accepts(self, card: Card) -> bool:
+        return not self.cards
+
+
+def join_columns(stacks: list[Stack], height) -> str:
+    columns = [stack.column() for stack in stacks]
+    m = max([len(column) for column in columns] + [height])
+    blank = " " * 9
+
+    lines = []
+    for i in range(m):
+        lines.append(edge_col(" │ ").join([column[i] if i < len(column) else blank for column in columns]))
+
+    up_edge = "┌" + "┬".join(["───────────" for _ in stacks]) + "┐"
+    down_edge = "└" + "┴".join(["───────────" for _ in stacks]) + "┘"
+
+    lines = [edge_col("│ ") + line + edge_col(" │") for line in lines]
+    lines = [edge_col(up_edge)] + lines + [edge_col(down_edge)]
+    return "\n".join(lines)
 
 
 class Header:
     def __init__(self, A: list[Stack], B: list[Stack]):
         self.A = A
         self.B = B
+        self.rendered = None, ""
 
     def __str__(self):
         stacks = self.A + self.B
-        stacks = [str(stack).splitlines() for stack in stacks]
-        m = max([len(stack) for stack in stacks] + [5])
-        for stack in stacks:
-            for _ in range(m - len(stack)):
-                stack.append(" " * 9)
-
-        lines = []
-        for i in range(m):
-            lines.append(edge_col(" │ ").join([stack[i] for stack in stacks]))
-
-        up_edge = "┌" + "┬".join(["───────────" for _ in stacks]) + "┐"
-        down_edge = "└" + "┴".join(["───────────" for _ in stacks]) + "┘"
-
-        lines = [edge_col("│ ") + line + edge_col(" │") for line in lines]
-        lines = [edge_col(up_edge)] + lines + [edge_col(down_edge)]
-        return "\n".join(lines)
+        versions = tuple([stack.version for stack in stacks])
+        if self.rendered[0] != versions:
+            self.rendered = versions, join_columns(stacks, 5)
+        return self.rendered[1]
 
     def __repr__(self):
         return self.__str__()
@@ -220,24 +283,13 @@ class Header:
 class Table:
     def __init__(self, stacks: list[Stack]):
         self.stacks = stacks
+        self.rendered = None, ""
 
     def __str__(self):
-        stacks = [str(stack).splitlines() for stack in self.stacks]
-        m = max([len(stack) for stack in stacks] + [23])
-        for stack in stacks:
-            for _ in range(m - len(stack)):
-                stack.append(" " * 9)
-
-        lines = []
-        for i in range(m):
-            lines.append(edge_col(" │ ").join([stack[i] for stack in stacks]))
-
-        up_edge = "┌" + "┬".join(["───────────" for _ in stacks]) + "┐"
-        down_edge = "└" + "┴".join(["───────────" for _ in stacks]) + "┘"
-
-        lines = [edge_col("│ ") + line + edge_col(" │") for line in lines]
-        lines = [edge_col(up_edge)] + lines + [edge_col(down_edge)]
-        return "\n".join(lines)
+        versions = tuple([stack.version for stack in self.stacks])
+        if self.rendered[0] != versions:
+            self.rendered = versions, join_columns(self.stacks, 23)
+        return self.rendered[1]
 
     def __repr__(self):
         return self.__str__()
@@ -253,45 +305,20 @@ class Commands:
     ESC = 6
     SPACE = 7
     UNDO = 8
-
-
-def print_to_screen(lines):
-    lines = [edge_col(line) for line in banner.splitlines()] + lines
-    up_edge = "┌─────────────────────────────────────────────────────────────────────────────────────────────────────┐"
-    down_edge = "└─────────────────────────────────────────────────────────────────────────────────────────────────────┘"
-    lines = [
-        edge_col(up_edge),
-        *[f"{edge_col('│  ')}{line}{edge_col('  │')}" for line in lines],
-        edge_col(down_edge),
-    ]
-
-    os.system("clear")
-
-    size = shutil.get_terminal_size(fallback=(103, 24))
-    columns = size.columns
-    bias = (columns - 103) // 2
-    print()
-    print()
-    print()
-    print("\n".join([f"{' ' * bias}{line}" for line in lines]))
-    print()
+    REPAINT = 9
+    HINT = 10
+    REDO = 11
+    REWIND = 12
+    ODDS = 13
+    SPLIT = 14
 
 
 def congrats():
-    time.sleep(0.5)
-    an = CongratulationAnimation()
-    for t in range(len(an.timeline)):
-        lines = [
-            *[" " * 97] * 2,
-            *an.get_frame(t),
-        ]
-
-        print_to_screen(lines)
-        time.sleep(0.05)
+    return Playback([[*[" " * 97] * 2, *frame] for frame in congrats_frames(cache_dir())], delay=0.5)
 
 
-def conform_new_game():
-    print_to_screen([
+def conform_new_game(screen):
+    screen.draw([
         *[" " * 97] * 13,
         *[edge_col(line) for line in conform_tip.splitlines()],
         *[" " * 97] * 18,
@@ -304,17 +331,59 @@ class Game:
     cursor: tuple[int, int]
     pop_card: Card | None
     pop_index: int
-    history: list[tuple[int, int]]
+    targets: dict[int, int]
+    history: History
+    where: list[int]
+    free_cells: int
+    empty_columns: int
     state: int
-
-    def __init__(self):
-        self.__restart()
+    screen: Screen
+    dirty: bool
+    animation: Playback | None
+    solver: Solver
+    results: Results
+    index: Index
+    level: str | None
+    number: int
+    auto: bool
+    journal: Journal | None
+    animate: bool
+    precompiled: bool
+    estimator: Estimator | None
+    odds: float | None
+
+    def __init__(self, screen: Screen = None, solver: Solver = None, number=None, level=None, auto=False,
+                 journal: Journal = None, animate=True, results: Results = None, index: Index = None,
+                 estimator: Estimator = None):
+        self.screen = screen or Screen([edge_col(line) for line in banner.splitlines()])
+        self.solver = solver or Solver()
+        self.results = results or Results(results_path())
+        self.index = index or Index(index_path())
+        self.level = level
+        self.auto = auto
+        self.dirty = False
+        self.animation = None
+        self.journal = journal
+        self.animate = animate
+        self.precompiled = False
+        # owned by the caller, who closes its pool; without one there are no win odds
+        self.estimator = estimator
+        self.odds = None
+        saved = journal.load() if journal and not number else None
+        if saved:
+            self.resume(*saved)
+        else:
+            self.__restart(number)
 
     def __str__(self):
         h = str(self.header)
         t = str(self.table)
         h_title = " ┌───────────────── Foundation ────────────────┐ ┌─────────────────── Buffer ──────────────────┐ "
-        t_title = " ┌────────────────────────────────────────── Tableau ──────────────────────────────────────────┐ "
+        odds = "" if self.odds is None else f"─ {self.odds:.0%} to win "
+        n = self.__to_empty()[1]
+        if n > 1:
+            odds += f"─ {n} cards to an empty column "
+        t_title = f" ┌{f' Tableau #{self.number} {odds}'.center(93, '─')}┐ "
 
         return f"""{edge_col(h_title)}
 {h}
@@ -328,14 +397,39 @@ class Game:
         return self.__str__()
 
     def refresh(self):
-        print_to_screen(str(self).splitlines())
-        r = min([len(a.cards) for a in self.header.A])
-        if r == 14:
-            self.state = 2
-            congrats()
+        self.dirty = True
+
+    def render(self):
+        if self.dirty:
+            self.dirty = False
+            self.draw()
+        if not self.precompiled and self.animation is None:
+            # build the congratulation frames in the background only once the tableau is up
+            self.precompiled = True
+            precompile(cache_dir())
+
+    def draw(self):
+        if self.state == 1:
+            conform_new_game(self.screen)
+        elif self.state == 2:
+            self.screen.draw([*[" " * 97] * 2, *congrats_frames(cache_dir())[-1]])
+        else:
+            probe = instrument.recorder
+            start = probe.clock() if probe else 0
+            lines = str(self).splitlines()
+            if probe:
+                probe.record(instrument.COMPOSE, start)
+            self.screen.draw(lines)
+
+    def skip(self):
+        if self.animation:
+            self.animation = None
+            self.refresh()
 
     def on(self, event):
-        if self.state == 2:
+        if event == Commands.REPAINT:
+            self.screen.repaint()
+        elif self.state == 2:
             if event == Commands.RESET:
                 self.__restart()
         elif self.state == 1:
@@ -347,7 +441,7 @@ class Game:
         else:
             if event == Commands.RESET:
                 self.state = 1
-                conform_new_game()
+                self.refresh()
             elif event == Commands.TAB:
                 self.__handle_tab()
             elif event == Commands.ESC:
@@ -358,44 +452,189 @@ class Game:
                 self.__handle_space()
             elif event == Commands.UNDO:
                 self.__handle_undo()
+            elif event == Commands.HINT:
+                self.__handle_hint()
+            elif event == Commands.REDO:
+                self.__handle_redo()
+            elif event == Commands.REWIND:
+                self.seek(0)
+            elif event == Commands.ODDS:
+                self.__handle_odds()
+            elif event == Commands.SPLIT:
+                self.__handle_split()
+
+            r = min([len(a.cards) for a in self.header.A])
+            if r == 14:
+                self.state = 2
+                self.refresh()
+                self.animation = congrats()
+                if self.journal:
+                    self.journal.clear()
 
-    def __restart(self):
-        suits = [Spades, Hearts, Clubs, Diamonds]
-        cards = [Card(suit, i + 1) for i in range(13) for suit in suits]
-        shuffled = random.sample(cards, len(cards))
-
+    def __reset(self):
         self.header = Header([AStack(suit) for suit in suits], [BStack() for _ in range(4)])
         self.table = Table([TableStack() for _ in range(8)])
         self.cursor = -1, -1
         self.pop_card = None
         self.pop_index = -1
-        self.history = []
+        self.targets = {}
         self.state = 0
 
-        # deal animation
-        interval = 0.05
-        k = 0
-
+    def __restart(self, number=None):
+        if not number and self.level:
+            number = self.index.pick(random, self.level)
+        self.number = number or pick(random, self.results)
+        cols = deal(self.number)
+        self.__reset()
+        self.solver.reset(None)
+
+        # deal animation, or the dealt tableau straight away
+        frames = [str(self).splitlines()] if self.animate else None
+        for row in range(max([len(col) for col in cols])):
+            for stack, col in zip(self.table.stacks, cols):
+                if row < len(col):
+                    stack.append(deck[col[row]])
+            if frames:
+                frames.append(str(self).splitlines())
+
+        self.__count()
+        self.__locate()
+        self.history = History(self.__snapshot)
+        self.dirty = not frames
+        self.animation = Playback(frames) if frames else None
+        if self.journal:
+            self.journal.start(self.number)
+
+    def resume(self, number, records):
+        # replay a journal straight into the stacks and history, nothing is drawn until the end
+        journal, self.journal = self.journal, None
+        self.__restart(number)
+        self.animation = None
+        valid = 0
+        for kind, arg in steps(records):
+            if kind == "seek":
+                self.seek(arg)
+                valid += 1
+                continue
+            # a damaged record ends the replay, keeping the moves before it
+            done = []
+            for f, t, n in arg:
+                if not self.__replay(f, t, n):
+                    break
+                done.append((f, t, n))
+            if done:
+                self.history.push(done)
+                valid += len(done)
+            if len(done) < len(arg):
+                break
+        self.journal = journal
+        if journal:
+            journal.start(number, records[:valid])
         self.refresh()
-        time.sleep(interval)
 
-        for _ in range(2):
-            for i in range(8):
-                self.table.stacks[i].cards.append(shuffled[k])
-                k += 1
-            time.sleep(interval)
-            self.refresh()
+    def __replay(self, f, t, n) -> bool:
+        if f == t or not n or self.__get_stacks()[f].peek() is None or n > self.__movable(f, t):
+            return False
+        self.__move(f, t, n)
+        return True
 
-        for i in range(8):
-            for j in range(i, 8):
-                self.table.stacks[j].cards.append(shuffled[k])
-                k += 1
-            time.sleep(interval)
-            self.refresh()
+    def export_state(self) -> State:
+        return State(
+            [bytes([card_ids[card] for card in stack.cards]) for stack in self.table.stacks],
+            [len(a.cards) - 1 for a in self.header.A],
+            [card_ids[b.cards[-1]] for b in self.header.B if b.cards],
+        )
+
+    def import_state(self, state: State):
+        self.skip()
+        self.__reset()
+        for stack, col in zip(self.table.stacks, state.cols):
+            for card in col:
+                stack.append(deck[card])
+        for j, a in enumerate(self.header.A):
+            for rank in range(state.found[j]):
+                a.append(deck[rank * 4 + j])
+        for b, card in zip(self.header.B, state.cells):
+            b.append(deck[card])
+        self.__count()
+        self.__locate()
+        self.history = History(self.__snapshot)
+        if self.journal:
+            self.journal.clear()
+            self.journal = None
+        self.refresh()
+
+    def __snapshot(self) -> tuple[bytes, ...]:
+        return tuple([bytes([card_ids[card] for card in stack.cards if card in card_ids])
+                      for stack in self.__get_stacks()])
+
+    def __restore(self, snapshot):
+        for stack, cards in zip(self.__get_stacks(), snapshot):
+            while stack.pop():
+                pass
+            for card in cards:
+                stack.append(deck[card])
+        self.__count()
+        self.__locate()
+
+    def seek(self, n):
+        # rebuild the position after step n from the nearest checkpoint, drawing only the result
+        self.__handle_esc()
+        snapshot, moves = self.history.seek(n)
+        self.__restore(snapshot)
+        for f, t, k in moves:
+            self.__move(f, t, k)
+        if self.journal:
+            self.journal.seek(len(self.history))
+        self.refresh()
 
     def __get_stacks(self):
         return self.table.stacks + self.header.A + self.header.B
 
+    def __count(self):
+        self.free_cells = sum([not b.cards for b in self.header.B])
+        self.empty_columns = sum([not t.cards for t in self.table.stacks])
+
+    def __locate(self):
+        # where[card id]: index of the stack holding the card
+        self.where = [0] * 52
+        for i, stack in enumerate(self.__get_stacks()):
+            for card in stack.cards:
+                if card in card_ids:
+                    self.where[card_ids[card]] = i
+
+    def __move(self, f, t, n=1):
+        stacks = self.__get_stacks()
+        src = stacks[f]
+        dst = stacks[t]
+        self.odds = None
+        cards = [src.remove() for _ in range(n)]
+        for card in reversed(cards):
+            dst.append(card)
+            self.where[card_ids[card]] = t
+        self.free_cells += (f >= 12) - (t >= 12)
+        self.empty_columns += (f < 8 and not src.cards) - (t < 8 and len(dst.cards) == n)
+
+    def __movable(self, f, t) -> int:
+        stacks = self.__get_stacks()
+        src = stacks[f]
+        dst = stacks[t]
+        if src.peek() is None:
+            return 0
+        if f >= 8 or t >= 8:
+            return 1 if dst.accepts(src.peek()) else 0
+
+        # (free cells + 1) * 2 ^ empty columns, not counting the destination itself
+        capacity = (self.free_cells + 1) << (self.empty_columns - (not dst.cards))
+        limit = min(src.run(), capacity)
+        if not dst.cards:
+            return limit
+        top = dst.cards[-1]
+        n = top.rank - src.cards[-1].rank
+        if n < 1 or n > limit or src.cards[-n].suit.cls == top.suit.cls:
+            return 0
+        return n
+
     def __handle_tab(self):
         x, y = self.cursor
         if x < 0 or y < 0:
@@ -408,26 +647,100 @@ class Game:
 
         if pop_card:
             if pop_index != cursor:
-                if not stacks[cursor].push(pop_card):
+                n = self.targets.get(cursor)
+                if not n:
                     return
-                stacks[pop_index].pop()
-                self.history.append((pop_index, cursor))
+                self.__move(pop_index, cursor, n)
+                step = [(pop_index, cursor, n)]
+                if self.auto:
+                    self.__autoplay(step)
+                self.history.push(step)
+                if self.journal:
+                    self.journal.moves(step)
             stacks[pop_index].trigger = False
             self.pop_card = None
             self.pop_index = -1
+            self.targets = {}
             for stack in stacks:
                 stack.mode = False
         else:
-            pop_card = stacks[cursor].peek()
-            if not pop_card:
+            if not stacks[cursor].peek():
                 return
-            stacks[pop_index].trigger = False
-            self.pop_card = pop_card
-            self.pop_index = cursor
-            stacks[cursor].trigger = True
-            for stack in stacks:
-                stack.mode = True
+            self.__grab(cursor)
+
+        self.refresh()
+
+    def __grab(self, src) -> bool:
+        # every legal destination and how many cards go there, worked out once per grab;
+        # the source maps to 0, Tab on it puts the card back
+        stacks = self.__get_stacks()
+        if stacks[src].peek() is None:
+            return False
+        stacks[self.pop_index].trigger = False
+        self.pop_card = stacks[src].peek()
+        self.pop_index = src
+        stacks[src].trigger = True
+        self.targets = {src: 0}
+        for t in range(len(stacks)):
+            if t != src:
+                n = self.__movable(src, t)
+                if n:
+                    self.targets[t] = n
+        for i, stack in enumerate(stacks):
+            stack.mode = i in self.targets
+        return True
+
+    def __handle_hint(self):
+        state = self.export_state()
+        move = self.solver.hint(state)
+        if move is None:
+            return
+
+        src, dst = move
+        if src >= CELL:
+            card = deck[state.cells[src - CELL]]
+            src = next(12 + i for i, b in enumerate(self.header.B) if b.peek() is card)
+        if dst == CELL:
+            dst = next(12 + i for i, b in enumerate(self.header.B) if not b.cards)
+
+        # grab the hinted card and leave the cursor on its destination, Tab places it
+        stacks = self.__get_stacks()
+        if not self.__grab(src):
+            return
+        if dst < 8 and not stacks[dst].cards:
+            # the solver plans single cards, a whole run would leave its plan behind
+            self.targets[dst] = 1
+        x, y = self.cursor
+        if x >= 0 and y >= 0:
+            stacks[y * 8 + x].focus = False
+        stacks[dst].focus = True
+        self.cursor = dst % 8, dst // 8
+
+        self.refresh()
+
+    def __to_empty(self) -> tuple[list[int], int]:
+        # the empty columns the held card can go to, and how many cards would go there
+        stacks = self.__get_stacks()
+        empty = [t for t in self.targets if t < 8 and t != self.pop_index and not stacks[t].cards]
+        return empty, self.targets[empty[0]] if empty else 0
 
+    def __handle_split(self):
+        # one card fewer into empty columns on every press, back to the whole run after one
+        empty, n = self.__to_empty()
+        if not empty:
+            return
+        full = self.__movable(self.pop_index, empty[0])
+        n = n - 1 or full
+        for t in empty:
+            self.targets[t] = n
+        self.refresh()
+
+    def __handle_odds(self):
+        # playouts on the estimator's process pool; the estimate holds until the next move
+        if self.estimator is None:
+            return
+        estimate = self.estimator.estimate(self.export_state())
+        self.odds = estimate.best()[1]
         self.refresh()
 
     def __handle_esc(self):
@@ -440,12 +753,38 @@ class Game:
         stacks[pop_index].trigger = False
         self.pop_card = None
         self.pop_index = -1
+        self.targets = {}
         for stack in stacks:
             stack.mode = False
 
         self.refresh()
 
+    def __jump(self, event):
+        # while a card is held the cursor only visits its legal destinations
+        x, y = self.cursor
+        cursor = y * 8 + x
+        order = sorted(self.targets)
+        if event == Commands.ARROW_RIGHT:
+            t = next((t for t in order if t > cursor), order[0])
+        elif event == Commands.ARROW_LEFT:
+            t = next((t for t in reversed(order) if t < cursor), order[-1])
+        else:
+            row = [t for t in order if t // 8 != y]
+            if not row:
+                return
+            t = min(row, key=lambda t: abs(t % 8 - x))
+
+        stacks = self.__get_stacks()
+        stacks[cursor].focus = False
+        stacks[t].focus = True
+        self.cursor = t % 8, t // 8
+
+        self.refresh()
+
     def __handle_arrow(self, event):
+        if self.pop_card:
+            self.__jump(event)
+            return
         x, y = self.cursor
         stacks = self.__get_stacks()
         if x >= 0 and y >= 0:
@@ -481,35 +820,68 @@ class Game:
 
         self.refresh()
 
+    def __autoplay(self, step: list) -> list:
+        # found[j] is both the height of foundation j and the rank of the card it needs next,
+        # so each pass only looks up four cards; repeat until none of them is safe to play
+        stacks = self.__get_stacks()
+        found = [len(a.cards) - 1 for a in self.header.A]
+        moved = True
+        while moved:
+            moved = False
+            for j in range(4):
+                if found[j] == 13:
+                    continue
+                card = found[j] * 4 + j
+                f = self.where[card]
+                if stacks[f].cards[-1] is deck[card] and safe(card, found):
+                    self.__move(f, j + 8)
+                    step.append((f, j + 8, 1))
+                    found[j] += 1
+                    moved = True
+        return step
+
     def __handle_space(self):
         if self.pop_card:
             return
-        for i, b in enumerate(self.table.stacks):
-            card = b.peek()
-            if card:
-                for j, a in enumerate(self.header.A):
-                    if a.push(card):
-                        b.pop()
-                        self.history.append((i, j + 8))
-                        self.refresh()
-                        return
-        for i, b in enumerate(self.header.B):
-            card = b.peek()
-            if card:
-                for j, a in enumerate(self.header.A):
-                    if a.push(card):
-                        b.pop()
-                        self.history.append((i + 12, j + 8))
-                        self.refresh()
-                        return
+        step = self.__autoplay([])
+        if not step:
+            # nothing is safe, play the first card the foundations accept and go on from there
+            for i, stack in enumerate(self.__get_stacks()):
+                card = stack.peek()
+                if not card or 8 <= i < 12:
+                    continue
+                j = card_ids[card] & 3
+                if self.header.A[j].accepts(card):
+                    self.__move(i, j + 8)
+                    step.append((i, j + 8, 1))
+                    self.__autoplay(step)
+                    break
+        if step:
+            self.history.push(step)
+            if self.journal:
+                self.journal.moves(step)
+            self.refresh()
 
     def __handle_undo(self):
         if self.pop_card:
             return
-        if not self.history:
+        moves = self.history.undo()
+        if not moves:
             return
-        f, t = self.history.pop()
-        stacks = self.__get_stacks()
-        card = stacks[t].pop()
-        stacks[f].append(card)
+        for f, t, n in reversed(moves):
+            self.__move(t, f, n)
+        if self.journal:
+            self.journal.seek(len(self.history))
+        self.refresh()
+
+    def __handle_redo(self):
+        if self.pop_card:
+            return
+        moves = self.history.redo()
+        if not moves:
+            return
+        for f, t, n in moves:
+            self.__move(f, t, n)
+        if self.journal:
+            self.journal.seek(len(self.history))
         self.refresh()
@@ -0,0 +1,95 @@
+from array import array
+from bisect import bisect_right
+
+# a move is one 16-bit word: from stack (4 bits), to stack (4 bits), card count (5 bits),
+# and the top bit set when it continues the step before it (an autoplay batch, say)
+CONTINUES = 0x8000
+
+
+def encode(f, t, n, continues=False) -> int:
+    return f | t << 4 | n << 8 | (CONTINUES if continues else 0)
+
+
+def decode(word) -> tuple[int, int, int]:
+    return word & 0xf, word >> 4 & 0xf, word >> 8 & 0x1f
+
+
+class History:
+    # every interval steps the whole position is kept, so seeking replays at most interval steps
+    interval = 32
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.words = array("H")
+        self.pos = 0
+        self.step = 0
+        self.marks = array("I", [0])
+        self.offsets = array("I", [0])
+        self.snapshots = [snapshot()]
+
+    def __len__(self):
+        return self.step
+
+    def push(self, moves):
+        # a new step drops everything that could have been redone
+        del self.words[self.pos:]
+        i = bisect_right(self.marks, self.step)
+        del self.marks[i:]
+        del self.offsets[i:]
+        del self.snapshots[i:]
+
+        for i, (f, t, n) in enumerate(moves):
+            self.words.append(encode(f, t, n, i > 0))
+        self.pos = len(self.words)
+        self.step += 1
+        if self.step % self.interval == 0:
+            self.marks.append(self.step)
+            self.offsets.append(self.pos)
+            self.snapshots.append(self.snapshot())
+
+    def undo(self) -> tuple[tuple[int, int, int], ...] | None:
+        if not self.step:
+            return None
+        end = self.pos
+        start = end - 1
+        while self.words[start] & CONTINUES:
+            start -= 1
+        self.pos = start
+        self.step -= 1
+        return tuple(decode(word) for word in self.words[start:end])
+
+    def redo(self) -> tuple[tuple[int, int, int], ...] | None:
+        words = self.words
+        start = self.pos
+        if start == len(words):
+            return None
+        end = start + 1
+        while end < len(words) and words[end] & CONTINUES:
+            end += 1
+        self.pos = end
+        self.step += 1
+        return tuple(decode(word) for word in words[start:end])
+
+    def size(self) -> int:
+        # steps that can be reached, counting the undone ones still open to redo
+        return self.step + sum(1 for word in self.words[self.pos:] if not word & CONTINUES)
+
+    def seek(self, n) -> tuple[tuple[bytes, ...], list[tuple[int, int, int]]]:
+        # the checkpoint at or before step n and the moves that lead from it to step n
+        n = max(0, min(n, self.size()))
+        i = bisect_right(self.marks, n) - 1
+        step = self.marks[i]
+        pos = self.offsets[i]
+        words = self.words
+        moves = []
+        while pos < len(words):
+            word = words[pos]
+            if not word & CONTINUES:
+                if step == n:
+                    break
+                step += 1
+            moves.append(decode(word))
+            pos += 1
+        self.pos = pos
+        self.step = n
+        return self.snapshots[i], moves
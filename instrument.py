@@ -0,0 +1,96 @@
+import json
+import os
+import time
+from array import array
+
+# phases of a frame: handling a command, composing the text, diffing and encoding rows, writing
+UPDATE = 0
+COMPOSE = 1
+ENCODE = 2
+WRITE = 3
+phases = ("update", "compose", "encode", "write")
+
+# None unless enabled; the probes in the hot paths only test this
+recorder = None
+
+
+class Recorder:
+    # a fixed ring of (phase, command, start, duration); the newest size events are kept
+    def __init__(self, size=1 << 16, clock=time.perf_counter, names=None):
+        self.size = size
+        self.clock = clock
+        self.names = names or {}
+        self.phase = array("B", bytes(size))
+        self.command = array("b", bytes(size))
+        self.start = array("d", bytes(8 * size))
+        self.length = array("d", bytes(8 * size))
+        self.count = 0
+        self.origin = clock()
+
+    def record(self, phase, start, command=-1):
+        i = self.count % self.size
+        self.phase[i] = phase
+        self.command[i] = command
+        self.start[i] = start
+        self.length[i] = self.clock() - start
+        self.count += 1
+
+    def label(self, phase, command) -> str:
+        if phase != UPDATE:
+            return phases[phase]
+        return f"update {self.names.get(command, command)}"
+
+    def events(self):
+        n = min(self.count, self.size)
+        first = self.count - n
+        for k in range(first, self.count):
+            i = k % self.size
+            yield self.phase[i], self.command[i], self.start[i], self.length[i]
+
+    def summary(self) -> str:
+        groups = {}
+        for phase, command, _, length in self.events():
+            groups.setdefault(phases[phase], []).append(length)
+            if phase == UPDATE:
+                groups.setdefault(self.label(phase, command), []).append(length)
+        lines = [f"{'phase':<20}{'count':>8}{'p50 us':>10}{'p99 us':>10}{'max us':>10}{'total ms':>10}"]
+        for name in sorted(groups, key=lambda name: (name.startswith("update "), name)):
+            samples = sorted(groups[name])
+            n = len(samples)
+            lines.append(f"{name:<20}{n:>8}{samples[n // 2] * 1e6:>10.1f}{samples[min(n * 99 // 100, n - 1)] * 1e6:>10.1f}"
+                         f"{samples[-1] * 1e6:>10.1f}{sum(samples) * 1e3:>10.1f}")
+        if self.count > self.size:
+            lines.append(f"(only the last {self.size} of {self.count} events were kept)")
+        return "\n".join(lines)
+
+    def trace(self, path):
+        # Chrome trace event format, open it in chrome://tracing or Perfetto
+        events = []
+        for phase, command, start, length in self.events():
+            events.append({
+                "name": self.label(phase, command),
+                "cat": phases[phase],
+                "ph": "X",
+                "ts": (start - self.origin) * 1e6,
+                "dur": length * 1e6,
+                "pid": os.getpid(),
+                "tid": phase,
+            })
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def enable(size=1 << 16, names=None) -> Recorder:
+    global recorder
+    recorder = Recorder(size, names=names)
+    return recorder
+
+
+def dump(target, out):
+    if recorder is None or not target:
+        return
+    if target in ("-", "summary"):
+        print(recorder.summary(), file=out)
+    else:
+        recorder.trace(target)
+        print(f"{recorder.count} events written to {target}", file=out)
@@ -0,0 +1,82 @@
+import os
+import struct
+from array import array
+
+from common import cache_dir
+from history import CONTINUES, encode, decode
+
+# header: magic and deal number; then one little-endian 16-bit record per move, in the
+# history.encode layout, or SEEK | step when undo, redo or a rewind moved to another step
+header = struct.Struct("<4sI")
+SEEK = 0x4000
+
+
+def journal_path():
+    return os.path.join(cache_dir(), "journal.bin")
+
+
+def steps(records):
+    # ("move", moves) per recorded step and ("seek", step) per seek, in order
+    step = []
+    for word in records:
+        if step and (word & SEEK or not word & CONTINUES):
+            yield "move", step
+            step = []
+        if word & SEEK:
+            yield "seek", word & 0x3fff
+        else:
+            step.append(decode(word))
+    if step:
+        yield "move", step
+
+
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def load(self) -> tuple[int, array] | None:
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < header.size:
+            return None
+        magic, number = header.unpack_from(data)
+        if magic != b"FCJ1":
+            return None
+        # a record cut short by a crash is dropped
+        body = data[header.size:]
+        records = array("H", struct.unpack(f"<{len(body) // 2}H", body[:len(body) & ~1]))
+        return number, records
+
+    def start(self, number, records=()):
+        # rewrites the file, so a resumed game continues from its last whole record
+        self.close()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.file = open(self.path, "wb", buffering=0)
+        self.file.write(header.pack(b"FCJ1", number) + struct.pack(f"<{len(records)}H", *records))
+
+    def write(self, words):
+        # unbuffered, one write per step: a kill loses at most the step being written
+        if self.file:
+            self.file.write(struct.pack(f"<{len(words)}H", *words))
+
+    def moves(self, moves):
+        self.write([encode(f, t, n, i > 0) for i, (f, t, n) in enumerate(moves)])
+
+    def seek(self, step):
+        self.write([SEEK | min(step, 0x3fff)])
+
+    def clear(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
@@ -1,10 +1,27 @@
-from pynput import keyboard
-from pynput.keyboard import Key, KeyCode
+import time
 
+started = time.perf_counter()
+
+import argparse
+import os
+import signal
+import sys
+
+from deals import Index
+import instrument
 from game import Game, Commands
+from journal import Journal, journal_path
+from playout import Estimator
+from scheduler import Loop
 
-game = Game()
+try:
+    import termios
+except ImportError:
+    termios = None
 
+imported = time.perf_counter()
+
+# macOS virtual key codes, for the pynput listener
 key_map = {
     123: Commands.ARROW_LEFT,
     124: Commands.ARROW_RIGHT,
@@ -15,19 +32,121 @@ key_map = {
     48: Commands.TAB,
     49: Commands.SPACE,
     53: Commands.ESC,
+    37: Commands.REPAINT,
+    4: Commands.HINT,
+    15: Commands.REDO,
+    11: Commands.REWIND,
+    31: Commands.ODDS,
+    1: Commands.SPLIT,
 }
 
 
-def on_press(key):
-    code = 0
-    if isinstance(key, Key):
-        code = key.value.vk
-    elif isinstance(key, KeyCode):
-        code = key.vk
+def listen_pynput(loop):
+    from pynput import keyboard
+    from pynput.keyboard import Key, KeyCode
+
+    def on_press(key):
+        code = 0
+        if isinstance(key, Key):
+            code = key.value.vk
+        elif isinstance(key, KeyCode):
+            code = key.vk
+
+        if code in key_map:
+            loop.put(key_map.get(code))
+
+    with keyboard.Listener(on_press=on_press) as listener:
+        listener.join()
+
+
+def listen_tty(loop):
+    from terminal import Keyboard
+
+    Keyboard(loop.put).run()
+
+
+def report_latency(loop):
+    samples = sorted(loop.latency)
+    if not samples:
+        return
+    p50 = samples[len(samples) // 2] * 1e3
+    p99 = samples[min(len(samples) * 99 // 100, len(samples) - 1)] * 1e3
+    print(f"{len(samples)} keys, latency p50 {p50:.1f} ms, p99 {p99:.1f} ms, max {samples[-1] * 1e3:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="terminal FreeCell")
+    parser.add_argument("--deal", type=int, default=None, help="play this Microsoft deal number")
+    parser.add_argument("--level", choices=Index.levels, default=None, help="draw deals from this difficulty")
+    parser.add_argument("--auto", action="store_true", help="move safe cards to the foundations after every move")
+    parser.add_argument("--fresh", action="store_true", help="discard the unfinished game instead of resuming it")
+    parser.add_argument("--input", choices=("tty", "pynput"), default="tty" if termios else "pynput",
+                        help="read keys from the terminal or from a global pynput listener")
+    parser.add_argument("--latency", action="store_true", help="print key to frame latency on exit")
+    parser.add_argument("--no-deal-animation", dest="animate", action="store_false",
+                        help="show the dealt tableau at once")
+    parser.add_argument("--measure-startup", action="store_true",
+                        help="draw up to the playable frame, report where the time went and exit")
+    parser.add_argument("--budget", type=float, default=100,
+                        help="time to the playable frame budget in ms for --measure-startup")
+    parser.add_argument("--profile", nargs="?", const="summary", default=None, metavar="TRACE",
+                        help="time command handling and rendering; print a summary on exit or write a Chrome trace")
+    args = parser.parse_args()
+    # FREECELL_PROFILE=summary, or a path for a Chrome trace, does the same as --profile
+    profile = args.profile or os.environ.get("FREECELL_PROFILE")
+    if profile:
+        instrument.enable(names={value: name.lower() for name, value in vars(Commands).items() if name.isupper()})
+
+    journal = Journal(journal_path())
+    if args.fresh:
+        journal.clear()
+    # one process pool for the win odds, started on the first request and closed on the way out
+    estimator = Estimator()
+    game = Game(number=args.deal, level=args.level, auto=args.auto, journal=journal, animate=args.animate,
+                estimator=estimator)
+    loop = Loop(game)
+    initialized = time.perf_counter()
+
+    if args.measure_startup:
+        # through the real loop, up to the frame that shows the dealt tableau; the deal animation counts
+        frames = []
+        write = game.screen.write
+        game.screen.write = lambda text: (write(text), frames.append(time.perf_counter()))
+        loop.start()
+        while not frames or game.animation is not None or game.dirty:
+            time.sleep(0.001)
+        loop.stop()
+        first, rendered = frames[0], frames[-1]
+        journal.close()
+        game.screen.close()
+        total = (rendered - started) * 1e3
+        print(f"import {(imported - started) * 1e3:.1f} ms, init {(initialized - imported) * 1e3:.1f} ms, "
+              f"first frame {(first - initialized) * 1e3:.1f} ms, playable {(rendered - initialized) * 1e3:.1f} ms, "
+              f"total {total:.1f} ms ({'within' if total <= args.budget else 'over'} the {args.budget:.0f} ms budget)")
+        instrument.dump(profile, sys.stdout)
+        sys.exit(0 if total <= args.budget else 1)
+
+    loop.start()
+    if hasattr(signal, "SIGWINCH"):
+        # the layout is only measured again after a resize, in a single full repaint
+        signal.signal(signal.SIGWINCH, lambda signum, frame: loop.put(Commands.REPAINT))
 
-    if code in key_map:
-        game.on(key_map.get(code))
+    try:
+        if args.input == "pynput":
+            listen_pynput(loop)
+        else:
+            listen_tty(loop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.stop()
+        estimator.close()
+        journal.close()
+        game.screen.close()
+        if args.latency:
+            report_latency(loop)
+        instrument.dump(profile, sys.stdout)
 
 
-with keyboard.Listener(on_press=on_press) as listener:
-    listener.join()
+if __name__ == "__main__":
+    main()
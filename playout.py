@@ -0,0 +1,134 @@
+import argparse
+import os
+import random
+import time
+
+from deals import deal
+from solver import autoplay, heuristic
+from state import State, CELL
+
+
+def playout(state: State, rng: random.Random, depth=150, greedy=0.9, cells=4) -> bool:
+    # mostly greedy on the solver heuristic, random otherwise, never back into a position seen before
+    state, _ = autoplay(state)
+    seen = {state.hash}
+    for _ in range(depth):
+        if state.won():
+            return True
+        children = []
+        for move in state.moves(cells):
+            child, _ = autoplay(state.apply(move))
+            if child.hash not in seen:
+                children.append(child)
+        if not children:
+            return False
+        if rng.random() < greedy:
+            state = min(children, key=heuristic)
+        else:
+            state = rng.choice(children)
+        seen.add(state.hash)
+    return state.won()
+
+
+def run(args) -> tuple[list[int], int]:
+    # a chunk of playouts after each candidate move; the position comes packed, not as Cards
+    packed, moves, count, seed, depth = args
+    root = State.unpack(packed)
+    rng = random.Random(seed)
+    wins = []
+    for move in moves:
+        state = root.apply(move)
+        wins.append(sum([playout(state, rng, depth) for _ in range(count)]))
+    return wins, count * len(moves)
+
+
+class Estimate:
+    def __init__(self, moves, wins, runs, elapsed, processes):
+        self.moves = moves
+        self.wins = wins
+        self.runs = runs
+        self.elapsed = elapsed
+        self.processes = processes
+
+    def rates(self) -> list[float]:
+        per_move = self.runs / len(self.moves) if self.moves else 0
+        return [wins / per_move if per_move else 0.0 for wins in self.wins]
+
+    def best(self):
+        rates = self.rates()
+        if not rates:
+            return None, 0.0
+        i = max(range(len(rates)), key=rates.__getitem__)
+        return self.moves[i], rates[i]
+
+    def per_core(self) -> float:
+        return self.runs / self.elapsed / self.processes if self.elapsed else 0.0
+
+
+class Estimator:
+    def __init__(self, processes=None, budget=0.5, chunk=4, depth=150, clock=time.monotonic):
+        self.processes = processes or os.cpu_count() or 1
+        self.budget = budget
+        self.chunk = chunk
+        self.depth = depth
+        self.clock = clock
+        self.pool = None
+
+    def estimate(self, state: State, budget=None) -> Estimate:
+        # rounds of chunks over every candidate move until the budget runs out; two chunks per
+        # process stay in flight so no worker waits on the parent
+        from multiprocessing import Pool
+
+        if self.pool is None:
+            self.pool = Pool(self.processes)
+        start = self.clock()
+        deadline = start + (self.budget if budget is None else budget)
+        moves = list(state.moves())
+        wins = [0] * len(moves)
+        runs = 0
+        if not moves:
+            return Estimate(moves, wins, runs, 0.0, self.processes)
+
+        packed = state.pack()
+        seed = random.getrandbits(32)
+        pending = []
+        for i in range(self.processes * 2):
+            pending.append(self.pool.apply_async(run, ((packed, moves, self.chunk, seed + i, self.depth),)))
+        submitted = len(pending)
+        while pending:
+            chunk, n = pending.pop(0).get()
+            wins = [a + b for a, b in zip(wins, chunk)]
+            runs += n
+            if self.clock() < deadline:
+                args = (packed, moves, self.chunk, seed + submitted, self.depth)
+                pending.append(self.pool.apply_async(run, (args,)))
+                submitted += 1
+        return Estimate(moves, wins, runs, self.clock() - start, self.processes)
+
+    def close(self):
+        if self.pool:
+            self.pool.terminate()
+            self.pool = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="win estimates by playouts")
+    parser.add_argument("deal", type=int)
+    parser.add_argument("--budget", type=float, default=2.0, help="seconds")
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--depth", type=int, default=150, help="moves per playout before giving up")
+    args = parser.parse_args(argv)
+
+    estimator = Estimator(args.jobs, args.budget, depth=args.depth)
+    result = estimator.estimate(State(deal(args.deal)))
+    estimator.close()
+    for move, rate in sorted(zip(result.moves, result.rates()), key=lambda m: -m[1]):
+        src, dst = move
+        print(f"{'cell ' + str(src - CELL) if src >= CELL else 'col ' + str(src)} -> "
+              f"{'cell' if dst == CELL else 'foundation' if dst >= 8 else 'col ' + str(dst)}\t{rate:.0%}")
+    print(f"{result.runs} playouts in {result.elapsed:.2f}s, {result.per_core():.0f}/s per core "
+          f"on {result.processes} processes")
+
+
+if __name__ == "__main__":
+    main()
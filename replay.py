@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from deals import deal
+from journal import Journal, steps
+from solver import Solver
+from state import CELL, State, fits_column
+
+WON = "won"
+UNFINISHED = "unfinished"
+ILLEGAL = "illegal"
+
+
+class Board:
+    # the game's 16 stacks as card ints: columns 0-7, foundations 8-11 in suit order, cells 12-15
+    __slots__ = ("stacks",)
+
+    def __init__(self, cols):
+        self.stacks = [list(col) for col in cols] + [[] for _ in range(8)]
+
+    def accepts(self, t, card) -> bool:
+        dst = self.stacks[t]
+        if t < 8:
+            return not dst or fits_column(card, dst[-1])
+        if t < 12:
+            return card & 3 == t - 8 and len(dst) == card >> 2
+        return not dst
+
+    def run(self, f) -> int:
+        col = self.stacks[f]
+        n = 1
+        while n < len(col) and fits_column(col[-n], col[-n - 1]):
+            n += 1
+        return n
+
+    def movable(self, f, t) -> int:
+        # same rules as Game: one card unless both ends are columns, then a run within capacity
+        stacks = self.stacks
+        src = stacks[f]
+        dst = stacks[t]
+        if f == t or not src:
+            return 0
+        if f >= 8 or t >= 8:
+            return 1 if self.accepts(t, src[-1]) else 0
+
+        free = sum([not cell for cell in stacks[12:]])
+        empty = sum([not col for col in stacks[:8]])
+        limit = min(self.run(f), (free + 1) << (empty - (not dst)))
+        if not dst:
+            return limit
+        n = (dst[-1] >> 2) - (src[-1] >> 2)
+        if n < 1 or n > limit or not fits_column(src[-n], dst[-1]):
+            return 0
+        return n
+
+    def place(self, src, dst):
+        # a move as State and the solver make them: src CELL + i is the i-th held card in card
+        # order, dst CELL is any free cell; one card at a time
+        cells = self.stacks[12:]
+        if src >= CELL:
+            held = sorted([(stack[0], 12 + i) for i, stack in enumerate(cells) if stack])
+            if src - CELL >= len(held):
+                return None
+            src = held[src - CELL][1]
+        if dst == CELL:
+            dst = next((12 + i for i, stack in enumerate(cells) if not stack), None)
+            if dst is None:
+                return None
+        return src, dst, 1
+
+    def apply(self, move) -> bool:
+        # (f, t, n) moves exactly n cards between the game's stacks, (src, dst) is a State move;
+        # anything else, as a move from a hand-edited file can be, is illegal
+        if not isinstance(move, (list, tuple)) or len(move) not in (2, 3):
+            return False
+        if not all([type(i) is int for i in move]) or not all([0 <= i < 16 for i in move[:2]]):
+            return False
+        move = self.place(*move) if len(move) == 2 else move
+        if move is None:
+            return False
+        f, t, n = move
+        limit = self.movable(f, t)
+        if not 1 <= n <= limit or n < limit and (t >= 8 or self.stacks[t]):
+            return False
+        src = self.stacks[f]
+        self.stacks[t].extend(src[-n:])
+        del src[-n:]
+        return True
+
+    def won(self) -> bool:
+        return all([len(stack) == 13 for stack in self.stacks[8:12]])
+
+
+def verify(game) -> dict:
+    name, number, moves = game
+    if type(number) is not int or not isinstance(moves, list):
+        return {"name": name, "deal": number, "outcome": ILLEGAL, "at": 0, "move": None}
+    board = Board(deal(number))
+    for i, move in enumerate(moves):
+        if not board.apply(move):
+            return {"name": name, "deal": number, "outcome": ILLEGAL, "at": i, "move": move}
+    return {"name": name, "deal": number, "outcome": WON if board.won() else UNFINISHED, "moves": len(moves)}
+
+
+def solved(number) -> dict | None:
+    # the solver's own solution, which has to verify as won; None when it finds none in time
+    moves = Solver(budget=None).solve(State(deal(number)), nodes=200000)
+    return None if moves is None else verify((f"solver {number}", number, moves))
+
+
+def journal_moves(records) -> list[tuple[int, int, int]]:
+    # the moves still standing after the journal's undos, redos and rewinds
+    done = []
+    pos = 0
+    for kind, arg in steps(records):
+        if kind == "seek":
+            pos = min(arg, len(done))
+        else:
+            del done[pos:]
+            done.append(arg)
+            pos += 1
+    return [move for step in done[:pos] for move in step]
+
+
+def load(path):
+    # (name, deal, moves) for a game JSON file, each line of a JSONL file or a saved journal
+    if path.endswith(".bin"):
+        saved = Journal(path).load()
+        if saved:
+            yield path, saved[0], journal_moves(saved[1])
+    elif path.endswith(".jsonl"):
+        with open(path) as f:
+            for i, line in enumerate(f, 1):
+                if line.strip():
+                    yield parse(line, f"{path}:{i}")
+    elif path.endswith(".json"):
+        with open(path) as f:
+            yield parse(f.read(), path)
+
+
+def parse(text, name):
+    # a record that is not a game still gets a result, verify() finds it illegal
+    try:
+        record = json.loads(text)
+    except ValueError:
+        record = None
+    if not isinstance(record, dict):
+        return name, None, None
+    return record.get("name", name), record.get("deal"), record.get("moves")
+
+
+def games(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for entry in sorted(os.listdir(path)):
+                yield from load(os.path.join(path, entry))
+        else:
+            yield from load(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="check recorded games against the rules")
+    parser.add_argument("paths", nargs="*", help="game .json files, .jsonl files, journals or directories of them")
+    parser.add_argument("--solver", nargs=2, type=int, metavar=("FIRST", "LAST"),
+                        help="solve these deals instead and check that every solution wins")
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="print every result as a JSON line")
+    args = parser.parse_args(argv)
+    if not args.paths and not args.solver:
+        parser.error("give game files or --solver FIRST LAST")
+
+    counts = {WON: 0, UNFINISHED: 0, ILLEGAL: 0}
+    start = time.perf_counter()
+    with Pool(args.jobs) as pool:
+        if args.solver:
+            results = pool.imap_unordered(solved, range(args.solver[0], args.solver[1] + 1), chunksize=4)
+        else:
+            results = pool.imap_unordered(verify, games(args.paths), chunksize=64)
+        for result in results:
+            if result is None:
+                continue
+            counts[result["outcome"]] += 1
+            if args.json:
+                print(json.dumps(result))
+            elif result["outcome"] == ILLEGAL:
+                print(f"{result['name']}: deal {result['deal']}, move {result['at']} {result['move']} is illegal")
+            elif result["outcome"] == UNFINISHED and args.solver:
+                print(f"{result['name']}: the solution leaves deal {result['deal']} unfinished")
+
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(f"{total} games: {counts[WON]} won, {counts[UNFINISHED]} unfinished, {counts[ILLEGAL]} illegal "
+          f"in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f}/s)", file=sys.stderr)
+    return 1 if counts[ILLEGAL] or args.solver and counts[UNFINISHED] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import instrument
+from game import Game
+
+
+class Loop:
+    def __init__(self, game: Game, fps=60, clock=time.monotonic, sleep=time.sleep):
+        self.game = game
+        self.interval = 1 / fps
+        self.clock = clock
+        self.sleep = sleep
+        self.queue = queue.SimpleQueue()
+        self.latency = deque(maxlen=4096)
+        self.thread = None
+
+    def put(self, command, at=None):
+        self.queue.put((command, self.clock() if at is None else at))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="game", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.queue.put(None)
+        if self.thread:
+            self.thread.join()
+
+    def drain(self, first) -> list:
+        items = [first]
+        while True:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    def timeout(self):
+        # a frame that is due, such as the first one of a resumed game, is drawn without waiting for a key
+        if self.game.dirty:
+            return 0
+        playback = self.game.animation
+        if playback is None:
+            return None
+        if playback.deadline is None:
+            return 0
+        return max(playback.deadline - self.clock(), 0)
+
+    def run(self):
+        while True:
+            try:
+                items = self.drain(self.queue.get(timeout=self.timeout()))
+            except queue.Empty:
+                items = []
+            if None in items:
+                return
+            now = self.clock()
+            self.step(items, now)
+            # commands arriving before the next tick are folded into one frame
+            self.sleep(max(self.interval - (self.clock() - now), 0))
+
+    def step(self, items, now):
+        game = self.game
+        if items:
+            # any input cuts the running animation short; the game state is already final
+            game.skip()
+        probe = instrument.recorder
+        for command, _ in items:
+            start = probe.clock() if probe else 0
+            game.on(command)
+            if probe:
+                probe.record(instrument.UPDATE, start, command)
+
+        playback = game.animation
+        if playback is None or not playback.started():
+            game.render()
+        if playback:
+            if playback.deadline is None:
+                playback.deadline = now + playback.delay
+            if playback.deadline <= now:
+                game.screen.draw(playback.advance(now))
+                if playback.done():
+                    game.animation = None
+
+        done = self.clock()
+        self.latency.extend([done - t for _, t in items])
@@ -0,0 +1,218 @@
+import re
+import shutil
+import sys
+from functools import lru_cache
+
+import instrument
+from common import edge_col
+
+up_edge = "┌─────────────────────────────────────────────────────────────────────────────────────────────────────┐"
+down_edge = "└─────────────────────────────────────────────────────────────────────────────────────────────────────┘"
+
+sgr = re.compile("\033\\[([0-9;]*)m")
+
+
+def frame_line(line):
+    return f"{edge_col('│  ')}{line}{edge_col('  │')}"
+
+
+@lru_cache(maxsize=4096)
+def split_sgr(row) -> tuple[str, ...]:
+    return tuple(sgr.split(row))
+
+
+@lru_cache(maxsize=256)
+def apply_sgr(params, fg, rev):
+    codes = params.split(";") if params else ["0"]
+    i = 0
+    while i < len(codes):
+        code = codes[i]
+        if code in ("", "0"):
+            fg, rev = None, False
+        elif code == "7":
+            rev = True
+        elif code == "27":
+            rev = False
+        elif code == "39":
+            fg = None
+        elif code == "38":
+            n = 3 if codes[i + 1:i + 2] == ["5"] else 5
+            fg = ";".join(codes[i:i + n])
+            i += n - 1
+        elif code.isdigit() and (30 <= int(code) <= 37 or 90 <= int(code) <= 97):
+            fg = code
+        i += 1
+    return fg, rev
+
+
+class Encoder:
+    # only the foreground color and reverse video are tracked, which is all the frames use
+    def __init__(self):
+        self.fg = None
+        self.rev = False
+
+    def encode(self, row) -> str:
+        out = []
+        fg, rev = None, False
+        for i, part in enumerate(split_sgr(row)):
+            if i % 2:
+                fg, rev = apply_sgr(part, fg, rev)
+            elif part:
+                if rev != self.rev or fg != self.fg and (rev or not part.isspace()):
+                    out.append(self.switch(fg, rev))
+                out.append(part)
+        return "".join(out)
+
+    def switch(self, fg, rev) -> str:
+        codes = []
+        if rev != self.rev:
+            codes.append("7" if rev else "27")
+        if fg != self.fg:
+            codes.append(fg or "39")
+        self.fg = fg
+        self.rev = rev
+        return f"\033[{';'.join(codes)}m"
+
+    def reset(self) -> str:
+        if self.fg is None and not self.rev:
+            return ""
+        self.fg = None
+        self.rev = False
+        return "\033[0m"
+
+
+@lru_cache(maxsize=4096)
+def crop(row, width) -> str:
+    # the first width visible characters, the SGR codes are all kept
+    out = []
+    left = width
+    for i, part in enumerate(split_sgr(row)):
+        if i % 2:
+            out.append(f"\033[{part}m")
+        elif left > 0:
+            out.append(part[:left])
+            left -= len(part)
+    return "".join(out)
+
+
+class Layout:
+    # everything that depends on the terminal size, measured once and kept until it is resized;
+    # lines is 0 when the height is unknown, as when the output is not a terminal
+    def __init__(self, columns, lines, width):
+        self.columns = columns
+        self.lines = lines
+        self.inner = width - 6
+        # the frame would wrap, so frames go without border and banner, cropped to the columns
+        self.narrow = columns < width
+        self.crop = columns if columns < self.inner else 0
+        self.left = edge_col("│  ")
+        self.right = edge_col("  │")
+        self.moves = {}
+
+    def fits(self, height) -> bool:
+        return not self.lines or height <= self.lines
+
+    def goto(self, top, compact) -> list[str]:
+        # the cursor position of every row, centered
+        moves = self.moves.get(compact)
+        if moves is None:
+            bias = max((self.columns - (self.inner if compact else self.inner + 6)) // 2, 0)
+            moves = self.moves[compact] = [f"\033[{top + i};{bias + 1}H" for i in range(self.lines or 128)]
+        return moves
+
+
+class Screen:
+    top = 4
+    width = 103
+
+    def __init__(self, head=(), out=None, size=None):
+        self.out = out or sys.stdout.buffer
+        # a fixed (columns, lines) for outputs that are not this process' terminal
+        self.size = size
+        # the banner is framed once; later frames only send the rows that changed
+        self.head = [edge_col(up_edge), *[frame_line(line) for line in head]]
+        self.tail = edge_col(down_edge)
+        self.layout = None
+        self.lines = None
+        self.compact = False
+        self.rows = []
+        self.encoder = Encoder()
+        self.frames = 0
+        self.written = 0
+        self.last = 0
+
+    def measure(self) -> Layout:
+        columns, lines = self.size or shutil.get_terminal_size(fallback=(self.width, 0))
+        self.layout = Layout(columns, lines, self.width)
+        self.rows = []
+        return self.layout
+
+    def repaint(self):
+        # also how a resize (SIGWINCH) gets in, the next frame measures again and is sent in full
+        self.layout = None
+        self.rows = []
+        if self.lines is not None:
+            self.draw(self.lines)
+
+    def draw(self, lines):
+        self.lines = lines
+        layout = self.layout or self.measure()
+        compact = layout.narrow or not layout.fits(self.top + len(self.head) + len(lines) + 2)
+        if compact != self.compact:
+            self.compact = compact
+            self.rows = []
+        if not compact:
+            left, right = layout.left, layout.right
+            self.update([*self.head, *[f"{left}{line}{right}" for line in lines], self.tail])
+        elif layout.crop:
+            self.update([crop(line, layout.crop) for line in lines])
+        else:
+            self.update(lines)
+
+    def update(self, rows):
+        probe = instrument.recorder
+        start = probe.clock() if probe else 0
+        layout = self.layout or self.measure()
+        last = self.rows
+        top = 1 if self.compact else self.top
+        if layout.lines:
+            # rows past the bottom would scroll the whole frame
+            rows = rows[:max(layout.lines - top - 1, 0)]
+        goto = layout.goto(top, self.compact)
+
+        encoder = self.encoder
+        out = []
+        if not last:
+            out.append("\033[?25l\033[H\033[2J")
+        for i, row in enumerate(rows):
+            if i < len(last) and last[i] == row:
+                continue
+            out.append(goto[i])
+            out.append(encoder.encode(row))
+        if len(rows) < len(last):
+            out.append(f"\033[{top + len(rows)};1H\033[J")
+        self.rows = rows
+
+        if out:
+            out.append(encoder.reset())
+            out.append(f"\033[{top + len(rows) + 1};1H")
+            text = "".join(out)
+            if probe:
+                probe.record(instrument.ENCODE, start)
+            self.write(text)
+
+    def write(self, text):
+        probe = instrument.recorder
+        start = probe.clock() if probe else 0
+        data = text.encode()
+        self.out.write(data)
+        self.out.flush()
+        if probe:
+            probe.record(instrument.WRITE, start)
+        self.frames += 1
+        self.written += len(data)
+        self.last = len(data)
+
+    def close(self):
+        top = 1 if self.compact else self.top
+        self.write(f"\033[{top + len(self.rows) + 1};1H\033[?25h\n")
@@ -0,0 +1,341 @@
+import argparse
+import asyncio
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from common import edge_col
+from deals import Index, Results, index_path, results_path
+from game import Game, Commands, banner
+from scheduler import Loop
+from solver import hint
+from screen import Screen
+from terminal import Decoder
+
+IAC, SB, SE = 255, 250, 240
+WILL, WONT, DO, DONT = 251, 252, 253, 254
+# telnet: we echo (that is, nothing) and suppress go-ahead, which puts clients in character mode
+CHARACTER_MODE = bytes([IAC, WILL, 1, IAC, WILL, 3])
+QUIT = b"\x03\x04"
+
+# rough sizes of a solver table entry and open node, for the per-session budget
+TABLE_ENTRY = 320
+OPEN_ENTRY = 480
+
+
+def strip_telnet(data: bytes) -> bytes:
+    if IAC not in data:
+        return data
+    out = bytearray()
+    i = 0
+    while i < len(data):
+        byte = data[i]
+        if byte != IAC:
+            out.append(byte)
+            i += 1
+            continue
+        command = data[i + 1] if i + 1 < len(data) else None
+        if command == IAC:
+            out.append(IAC)
+            i += 2
+        elif command == SB:
+            end = data.find(bytes([IAC, SE]), i + 2)
+            i = len(data) if end < 0 else end + 2
+        elif command in (WILL, WONT, DO, DONT):
+            i += 3
+        else:
+            i += 2
+    return bytes(out)
+
+
+class Output:
+    # the Screen's output file, writing into the connection's transport buffer
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+
+    def write(self, data):
+        self.writer.write(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def backlog(self) -> int:
+        return self.writer.transport.get_write_buffer_size()
+
+
+class Session:
+    def __init__(self, server: "Server", reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.output = Output(writer)
+        self.decoder = Decoder()
+        # the client's size is not known, frames are laid out for the full width
+        screen = Screen([edge_col(line) for line in banner.splitlines()], out=self.output, size=(Screen.width, 0))
+        # no estimator, so o does nothing here: playouts would take every core from every session
+        self.game = Game(screen, results=server.results, index=server.index, animate=False)
+        self.loop = Loop(self.game, clock=server.clock)
+        self.last = server.clock()
+        self.timer = None
+        self.closed = False
+
+    def tick(self, items):
+        if self.closed:
+            return
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        self.loop.step(items, self.server.clock())
+        if self.game.animation:
+            delay = self.loop.timeout()
+            self.timer = asyncio.get_running_loop().call_later(delay or self.loop.interval, self.tick, [])
+        self.check()
+
+    def footprint(self) -> int:
+        solver = self.game.solver
+        return (len(solver.table) * TABLE_ENTRY + len(solver.open) * OPEN_ENTRY + len(solver.pv) * TABLE_ENTRY
+                + len(self.game.history.words) * 2 + self.output.backlog())
+
+    def check(self):
+        # the hint search is the part that grows, drop it first; a client not reading its frames is closed
+        budget = self.server.budget
+        if self.footprint() > budget:
+            self.game.solver.reset(None)
+            self.game.solver.pv.clear()
+        if self.output.backlog() > budget:
+            self.close()
+
+    async def feed(self, commands, now):
+        # a hint's search runs in the server's worker processes so the other sessions keep
+        # getting frames; the hint command then takes that answer at once
+        start = 0
+        for i, command in enumerate(commands):
+            if command != Commands.HINT:
+                continue
+            if start < i:
+                self.tick([(command, now) for command in commands[start:i]])
+            if self.timer:
+                self.timer.cancel()
+                self.timer = None
+            state = self.game.export_state()
+            move = await asyncio.get_running_loop().run_in_executor(self.server.executor, hint, state.pack())
+            self.game.solver.remember(state, move)
+            if self.closed:
+                return
+            start = i
+        self.tick([(command, now) for command in commands[start:]])
+
+    async def run(self):
+        self.writer.write(CHARACTER_MODE)
+        self.tick([])
+        clock = self.server.clock
+        decoder = self.decoder
+        while not self.closed:
+            deadline = decoder.deadline()
+            try:
+                if deadline is None:
+                    data = await self.reader.read(1024)
+                else:
+                    data = await asyncio.wait_for(self.reader.read(1024), max(deadline - clock(), 0))
+            except asyncio.TimeoutError:
+                at = decoder.since
+                self.tick([(command, at) for command in decoder.expire(clock())])
+                continue
+            except ConnectionError:
+                break
+            now = clock()
+            if not data:
+                break
+            data = strip_telnet(data)
+            if any([byte in QUIT for byte in data]):
+                break
+            self.last = now
+            commands = decoder.feed(data, now)
+            if commands:
+                await self.feed(commands, now)
+            await self.writer.drain()
+        self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.timer:
+            self.timer.cancel()
+        self.writer.close()
+
+
+def watch_parent(parent):
+    # a hint worker exits with the server, even when the server is killed outright
+    def watch():
+        while os.getppid() == parent:
+            time.sleep(1)
+        os._exit(0)
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+class Server:
+    def __init__(self, host="127.0.0.1", port=2323, idle=600.0, budget=4 << 20, clock=time.monotonic):
+        self.host = host
+        self.port = port
+        self.idle = idle
+        self.budget = budget
+        self.clock = clock
+        self.sessions = set()
+        # hint searches, off the event loop and out of the GIL
+        self.executor = ProcessPoolExecutor(initializer=watch_parent, initargs=(os.getpid(),))
+        # one read-only view of the deal files for every session
+        self.results = Results(results_path())
+        self.index = Index(index_path())
+
+    async def handle(self, reader, writer):
+        session = Session(self, reader, writer)
+        self.sessions.add(session)
+        try:
+            await session.run()
+        finally:
+            self.sessions.discard(session)
+            session.close()
+
+    async def sweep(self):
+        while True:
+            await asyncio.sleep(min(self.idle / 4, 30))
+            now = self.clock()
+            for session in list(self.sessions):
+                if now - session.last > self.idle:
+                    session.close()
+
+    async def serve(self, ready=None):
+        server = await asyncio.start_server(self.handle, self.host, self.port, limit=4096, backlog=1024)
+        if ready:
+            ready()
+        sweeper = asyncio.create_task(self.sweep())
+        if hasattr(signal, "SIGTERM") and os.name != "nt":
+            # terminate is a clean stop, so the hint workers are shut down with the server
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            sweeper.cancel()
+            self.executor.shutdown(cancel_futures=True)
+
+
+def rss(pid) -> int | None:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+arrows = [b"\033[A", b"\033[B", b"\033[C", b"\033[D"]
+
+
+async def frame(reader):
+    # a frame always ends by parking the cursor below the table, ESC [ row ; 1 H
+    data = await reader.read(65536)
+    while data and not data.endswith(b"H"):
+        data = await reader.read(65536)
+
+
+async def connect(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    await frame(reader)
+    return reader, writer
+
+
+async def play(reader, writer, keys, pause, latencies, hinted, hints=0.1):
+    # every arrow moves the cursor and every hint grabs a card, so each key is answered by a
+    # frame; Esc puts the hinted card back, it waits out the decoder's timeout and is not timed
+    for _ in range(keys):
+        await asyncio.sleep(pause * (0.5 + random.random()))
+        hint = random.random() < hints
+        sent = time.perf_counter()
+        writer.write(b"h" if hint else random.choice(arrows))
+        await frame(reader)
+        (hinted if hint else latencies).append(time.perf_counter() - sent)
+        if hint:
+            writer.write(b"\033")
+            await frame(reader)
+
+
+async def load(host, port, sessions, keys, pause, hints=0.1, pid=None):
+    base = rss(pid) if pid else None
+    latencies = []
+    hinted = []
+    start = time.perf_counter()
+    connections = []
+    # connect in batches so the listen backlog never overflows
+    for i in range(0, sessions, 256):
+        batch = [connect(host, port) for _ in range(min(256, sessions - i))]
+        connections += await asyncio.gather(*batch)
+    connected = time.perf_counter() - start
+    loaded = rss(pid) if pid else None
+
+    await asyncio.gather(*[play(reader, writer, keys, pause, latencies, hinted, hints) for reader, writer in connections])
+    for _, writer in connections:
+        writer.close()
+
+    report = {"sessions": sessions, "connect_s": connected}
+    # arrows show what the other sessions see while hints are searched
+    for name, samples in (("keys", latencies), ("hints", hinted)):
+        samples.sort()
+        report[name] = len(samples)
+        if samples:
+            prefix = "" if name == "keys" else "hint_"
+            report[f"{prefix}p50_ms"] = samples[len(samples) // 2] * 1e3
+            report[f"{prefix}p99_ms"] = samples[min(len(samples) * 99 // 100, len(samples) - 1)] * 1e3
+    if base is not None and loaded is not None:
+        report["rss_per_session_kb"] = (loaded - base) / sessions / 1024
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FreeCell over telnet, one game per connection")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="accept telnet connections")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=2323)
+    serve.add_argument("--idle", type=float, default=600, help="close sessions idle for this many seconds")
+    serve.add_argument("--budget", type=int, default=4096, help="per-session memory budget in KB")
+
+    bench = sub.add_parser("load", help="start a server and drive it with many local connections")
+    bench.add_argument("--port", type=int, default=2324)
+    bench.add_argument("--sessions", type=int, default=1000)
+    bench.add_argument("--keys", type=int, default=20, help="arrow keys sent per session")
+    bench.add_argument("--pause", type=float, default=0.5, help="mean seconds between keys of one session")
+    bench.add_argument("--hints", type=float, default=0.1, help="share of keys that ask for a hint")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        server = Server(args.host, args.port, args.idle, args.budget << 10)
+        try:
+            asyncio.run(server.serve(lambda: print(f"listening on {args.host}:{args.port}", file=sys.stderr)))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    child = subprocess.Popen([sys.executable, __file__, "serve", "--port", str(args.port)], stderr=subprocess.PIPE)
+    try:
+        child.stderr.readline()
+        report = asyncio.run(load("127.0.0.1", args.port, args.sessions, args.keys, args.pause, args.hints, child.pid))
+    finally:
+        child.terminate()
+        child.wait()
+    for name, value in report.items():
+        print(f"{name:<20}{value:>12.2f}" if isinstance(value, float) else f"{name:<20}{value:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import heapq
+import time
+
+from state import State
+
+
+def heuristic(state: State) -> int:
+    found = state.found
+    h = (52 - sum(found)) * 2 + len(state.cells)
+    for col in state.cols:
+        if not col:
+            h -= 2
+            continue
+        low = 13
+        for card in col:
+            rank = card >> 2
+            if rank > low:
+                # sits on a lower card that has to be dug out first
+                h += 1
+            else:
+                low = rank
+    return h
+
+
+def autoplay(state: State):
+    moves = []
+    move = state.safe_move()
+    while move:
+        moves.append(move)
+        state = state.apply(move)
+        move = state.safe_move()
+    return state, moves
+
+
+class Solver:
+    def __init__(self, budget=0.05, cells=4, clock=time.perf_counter):
+        self.budget = budget
+        self.cells = cells
+        self.clock = clock
+        self.pv = {}
+        self.reset(None)
+
+    def reset(self, root: State | None):
+        self.root = root
+        # the moves name columns by index, so positions are told apart by pack(), not the
+        # order-blind hash
+        self.key = None if root is None else root.pack()
+        # the last hint given, so asking again for the same position costs nothing
+        self.answer = None, None
+        # transposition table: hash -> (parent hash, moves leading here)
+        self.table = {} if root is None else {root.hash: (None, ())}
+        self.open = [] if root is None else [(heuristic(root), 0, 0, root)]
+        self.best = 0, None
+        self.nodes = 0
+        self.solved = False
+        self.counter = 0
+
+    def hint(self, state: State):
+        key = state.pack()
+        if key in self.pv:
+            return self.pv[key]
+        if self.answer[0] == key:
+            return self.answer[1]
+        if self.key != key and not self.reroot(state):
+            # the search only tables positions after the safe moves to the foundations
+            settled, moves = autoplay(state)
+            if moves and (self.key == settled.pack() or self.reroot(settled)):
+                return moves[0]
+            self.reset(state)
+        self.search(deadline=self.clock() + self.budget)
+        if key in self.pv:
+            return self.pv[key]
+        path = self.path(self.best[1]) if self.best[1] is not None else []
+        self.answer = key, path[0] if path else next(state.moves(self.cells), None)
+        return self.answer[1]
+
+    def reroot(self, state: State) -> bool:
+        # carry on below a position the search already reached, dropping the rest of the table;
+        # the columns have to be in the order the search has them, the moves name them by index
+        table = self.table
+        if self.root is None or state.hash not in table:
+            return False
+        node = self.root
+        for move in self.path(state.hash):
+            node = node.apply(move)
+        if node.pack() != state.pack():
+            return False
+
+        inside = {state.hash: True}
+        for key in table:
+            chain = []
+            while key is not None and key not in inside:
+                chain.append(key)
+                key = table[key][0]
+            below = key is not None and inside[key]
+            for k in chain:
+                inside[k] = below
+        self.table = {key: entry for key, entry in table.items() if inside[key]}
+        self.table[state.hash] = None, ()
+        self.open = [entry for entry in self.open if inside.get(entry[3].hash)]
+        # expanded again: children it shared with dropped positions were tabled under those
+        self.counter += 1
+        self.open.append((heuristic(state), self.counter, 0, state))
+        heapq.heapify(self.open)
+        self.root = state
+        self.key = state.pack()
+        self.solved = False
+        if self.best[1] is None or not inside.get(self.best[1]):
+            self.best = min([(heuristic(entry[3]), entry[3].hash) for entry in self.open], default=(0, None))
+        return True
+
+    def remember(self, state: State, move):
+        # a hint worked out elsewhere, given for this position from now on
+        self.answer = state.pack(), move
+
+    def solve(self, state: State, nodes=None, budget=None):
+        self.reset(state)
+        deadline = None if budget is None else self.clock() + budget
+        self.search(deadline, nodes)
+        if not self.solved:
+            return None
+        moves = []
+        while state.pack() in self.pv:
+            move = self.pv[state.pack()]
+            moves.append(move)
+            state = state.apply(move)
+        return moves
+
+    def exhausted(self) -> bool:
+        return not self.open and not self.solved
+
+    def search(self, deadline=None, nodes=None):
+        table = self.table
+        open_ = self.open
+        root = self.root
+        cells = self.cells
+        while open_ and not self.solved:
+            if nodes is not None and self.nodes >= nodes:
+                return
+            if deadline is not None and self.nodes % 32 == 0 and self.clock() >= deadline:
+                return
+            _, _, g, state = heapq.heappop(open_)
+            self.nodes += 1
+            for move in state.moves(cells):
+                child, auto = autoplay(state.apply(move))
+                if child.hash in table:
+                    continue
+                table[child.hash] = state.hash, (move, *auto)
+                if child.won():
+                    self.finish(child.hash)
+                    return
+                h = heuristic(child)
+                if self.best[1] is None or h < self.best[0]:
+                    self.best = h, child.hash
+                self.counter += 1
+                heapq.heappush(open_, (h + g // 4, self.counter, g + 1, child))
+        if root is not None and not open_ and not self.solved:
+            self.best = 0, None
+
+    def path(self, key) -> list:
+        steps = []
+        while key is not None:
+            parent, moves = self.table[key]
+            steps.append(moves)
+            key = parent
+        return [move for moves in reversed(steps) for move in moves]
+
+    def finish(self, key):
+        self.solved = True
+        state = self.root
+        for move in self.path(key):
+            self.pv[state.pack()] = move
+            state = state.apply(move)
+
+
+def hint(packed: bytes, budget=0.05):
+    # one hint from a fresh search, for a worker process; the position comes packed
+    return Solver(budget).hint(State.unpack(packed))
@@ -0,0 +1,173 @@
+import random
+
+# cards are ints 0-51 in the order of common.deck: card = (rank - 1) * 4 + suit,
+# suits being Spades, Hearts, Clubs, Diamonds, so card & 1 is the color
+EMPTY = 52
+CELL = 12
+
+rng = random.Random(0x5eed)
+z_col = [rng.getrandbits(64) for _ in range(52 * 53)]
+z_cell = [rng.getrandbits(64) for _ in range(52)]
+z_found = [rng.getrandbits(64) for _ in range(4 * 14)]
+
+
+def fits_column(card, top) -> bool:
+    return top >> 2 == (card >> 2) + 1 and (top ^ card) & 1 == 1
+
+
+def fits_foundation(card, found) -> bool:
+    return found[card & 3] == card >> 2
+
+
+def safe(card, found) -> bool:
+    # nothing of the opposite color can still need this card as a parent
+    rank = card >> 2
+    if found[card & 3] != rank:
+        return False
+    other = (card & 1) ^ 1
+    return rank < 2 or found[other] >= rank and found[other + 2] >= rank
+
+
+class State:
+    # a column is hashed as the set of (card, card below it) pairs, free cells by card alone,
+    # so the hash does not depend on column order or on which free cell holds a card
+    __slots__ = ("cols", "found", "cells", "hash")
+
+    def __init__(self, cols, found=(0, 0, 0, 0), cells=(), h=None):
+        self.cols = tuple([bytes(col) for col in cols])
+        self.found = tuple(found)
+        self.cells = tuple(sorted(cells))
+        self.hash = self.compute() if h is None else h
+
+    def compute(self) -> int:
+        h = 0
+        for col in self.cols:
+            below = EMPTY
+            for card in col:
+                h ^= z_col[card * 53 + below]
+                below = card
+        for card in self.cells:
+            h ^= z_cell[card]
+        for suit, height in enumerate(self.found):
+            h ^= z_found[suit * 14 + height]
+        return h
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, other):
+        return (isinstance(other, State) and self.hash == other.hash and self.found == other.found
+                and self.cells == other.cells and sorted(self.cols) == sorted(other.cols))
+
+    def __repr__(self):
+        return f"State({[list(col) for col in self.cols]}, {self.found}, {self.cells})"
+
+    def canonical(self) -> "State":
+        return State(sorted(self.cols, key=lambda col: (len(col) == 0, col)), self.found, self.cells, self.hash)
+
+    def won(self) -> bool:
+        return self.found == (13, 13, 13, 13)
+
+    def card_at(self, src):
+        if src < 8:
+            col = self.cols[src]
+            return col[-1] if col else None
+        if src < CELL:
+            height = self.found[src - 8]
+            return (height - 1) * 4 + src - 8 if height else None
+        return self.cells[src - CELL]
+
+    def moves(self, cells=4):
+        # (src, dst): src is a column 0-7 or CELL + index into the sorted free cells,
+        # dst is a column 0-7, the foundation 8-11 of the card's suit or CELL for any free cell
+        found = self.found
+        tops = [(i, col[-1]) for i, col in enumerate(self.cols) if col]
+        tops += [(CELL + i, card) for i, card in enumerate(self.cells)]
+        empty = next((i for i, col in enumerate(self.cols) if not col), None)
+        for src, card in tops:
+            if found[card & 3] == card >> 2:
+                yield src, 8 + (card & 3)
+        for src, card in tops:
+            for dst, col in enumerate(self.cols):
+                if col and dst != src and fits_column(card, col[-1]):
+                    yield src, dst
+            if empty is not None and (src >= CELL or len(self.cols[src]) > 1):
+                yield src, empty
+        if len(self.cells) < cells:
+            for src, card in tops:
+                if src < CELL:
+                    yield src, CELL
+
+    def safe_move(self):
+        found = self.found
+        for i, col in enumerate(self.cols):
+            if col and safe(col[-1], found):
+                return i, 8 + (col[-1] & 3)
+        for i, card in enumerate(self.cells):
+            if safe(card, found):
+                return CELL + i, 8 + (card & 3)
+        return None
+
+    def apply(self, move) -> "State":
+        src, dst = move
+        cols = self.cols
+        found = self.found
+        cells = self.cells
+        h = self.hash
+
+        if src < 8:
+            col = cols[src]
+            card = col[-1]
+            h ^= z_col[card * 53 + (col[-2] if len(col) > 1 else EMPTY)]
+            cols = cols[:src] + (col[:-1],) + cols[src + 1:]
+        elif src < CELL:
+            suit = src - 8
+            height = found[suit]
+            card = (height - 1) * 4 + suit
+            h ^= z_found[suit * 14 + height] ^ z_found[suit * 14 + height - 1]
+            found = found[:suit] + (height - 1,) + found[suit + 1:]
+        else:
+            card = cells[src - CELL]
+            h ^= z_cell[card]
+            cells = cells[:src - CELL] + cells[src - CELL + 1:]
+
+        if dst < 8:
+            col = cols[dst]
+            h ^= z_col[card * 53 + (col[-1] if col else EMPTY)]
+            cols = cols[:dst] + (col + bytes((card,)),) + cols[dst + 1:]
+        elif dst < CELL:
+            suit = card & 3
+            height = found[suit]
+            h ^= z_found[suit * 14 + height] ^ z_found[suit * 14 + height + 1]
+            found = found[:suit] + (height + 1,) + found[suit + 1:]
+        else:
+            h ^= z_cell[card]
+            cells = tuple(sorted(cells + (card,)))
+
+        state = State.__new__(State)
+        state.cols = cols
+        state.found = found
+        state.cells = cells
+        state.hash = h
+        return state
+
+    def pack(self) -> bytes:
+        data = bytearray(self.found)
+        data.append(len(self.cells))
+        data.extend(self.cells)
+        for col in self.cols:
+            data.append(len(col))
+            data.extend(col)
+        return bytes(data)
+
+    @staticmethod
+    def unpack(data: bytes) -> "State":
+        found = tuple(data[:4])
+        n = data[4]
+        cells = tuple(data[5:5 + n])
+        i = 5 + n
+        cols = []
+        for _ in range(8):
+            cols.append(data[i + 1:i + 1 + data[i]])
+            i += 1 + data[i]
+        return State(cols, found, cells)
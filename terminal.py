@@ -0,0 +1,123 @@
+import os
+import selectors
+import sys
+import termios
+import time
+import tty
+
+from game import Commands
+
+ESC = 0x1b
+
+keys = {
+    ord("\t"): Commands.TAB,
+    ord(" "): Commands.SPACE,
+    ord("n"): Commands.RESET,
+    ord("u"): Commands.UNDO,
+    ord("h"): Commands.HINT,
+    ord("r"): Commands.REDO,
+    ord("b"): Commands.REWIND,
+    ord("o"): Commands.ODDS,
+    ord("s"): Commands.SPLIT,
+    ord("l"): Commands.REPAINT,
+    0x0c: Commands.REPAINT,
+}
+
+# final byte of CSI (ESC [) and SS3 (ESC O) sequences, modifiers such as ESC [1;2A are ignored
+finals = {
+    ord("A"): Commands.ARROW_UP,
+    ord("B"): Commands.ARROW_DOWN,
+    ord("C"): Commands.ARROW_RIGHT,
+    ord("D"): Commands.ARROW_LEFT,
+}
+
+
+class Decoder:
+    # a lone Esc is only known once the timeout passes without the rest of a sequence
+    def __init__(self, timeout=0.05):
+        self.timeout = timeout
+        self.buffer = b""
+        self.since = None
+
+    def feed(self, data: bytes, now) -> list[int]:
+        buffer = self.buffer + data
+        out = []
+        i = 0
+        while i < len(buffer):
+            byte = buffer[i]
+            if byte != ESC:
+                command = keys.get(byte)
+                if command is None and 0x41 <= byte <= 0x5a:
+                    command = keys.get(byte + 0x20)
+                if command is not None:
+                    out.append(command)
+                i += 1
+                continue
+            if i + 1 == len(buffer):
+                break
+            if buffer[i + 1] not in b"[O":
+                out.append(Commands.ESC)
+                i += 1
+                continue
+            j = i + 2
+            while j < len(buffer) and not 0x40 <= buffer[j] <= 0x7e:
+                j += 1
+            if j == len(buffer):
+                break
+            command = finals.get(buffer[j])
+            if command is not None:
+                out.append(command)
+            i = j + 1
+
+        self.buffer = buffer[i:]
+        if not self.buffer:
+            self.since = None
+        elif self.since is None:
+            self.since = now
+        return out
+
+    def deadline(self):
+        return None if self.since is None else self.since + self.timeout
+
+    def expire(self, now) -> list[int]:
+        if self.since is None or now < self.since + self.timeout:
+            return []
+        rest = self.buffer[1:]
+        self.buffer = b""
+        self.since = None
+        return [Commands.ESC, *self.feed(rest, now)]
+
+
+class Keyboard:
+    # reads the terminal in cbreak mode; put(command, at) gets the time the bytes were read,
+    # so the loop's latency covers decoding and the Esc timeout too
+    def __init__(self, put, fd=None, timeout=0.05, clock=time.monotonic):
+        self.put = put
+        self.fd = sys.stdin.fileno() if fd is None else fd
+        self.decoder = Decoder(timeout)
+        self.clock = clock
+
+    def run(self):
+        fd = self.fd
+        decoder = self.decoder
+        saved = termios.tcgetattr(fd)
+        tty.setcbreak(fd)
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(fd, selectors.EVENT_READ)
+                while True:
+                    deadline = decoder.deadline()
+                    ready = selector.select(None if deadline is None else max(deadline - self.clock(), 0))
+                    now = self.clock()
+                    if ready:
+                        data = os.read(fd, 1024)
+                        if not data:
+                            return
+                        commands = decoder.feed(data, now)
+                    else:
+                        now = decoder.since
+                        commands = decoder.expire(self.clock())
+                    for command in commands:
+                        self.put(command, now)
+        finally:
+            termios.tcsetattr(fd, termios.TCSADRAIN, saved)